@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+
+"""
+Measures the time and peak memory of the main processing stages
+on synthetic corpora of increasing size (see syntheticCorpus.py).
+No network access is needed
+"""
+
+import io
+import os
+import sys
+import copy
+import json
+import time
+import shutil
+import tempfile
+import platform
+import argparse
+import datetime
+import tracemalloc
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# pylint: disable=wrong-import-position
+import syntheticCorpus
+import hal
+import cache
+import webClient
+import docModel
+import confHandler
+import check_hal_untagged
+import generate_webpage_files
+
+# Existing group: its local patch file is read by confHandler
+GROUP = "SUBATECH-PLASMA"
+
+# Number of entries per page of the HAL answers
+HAL_PAGE_SIZE = 1000
+
+
+class _SolrPages:
+    """Stub of the web client serving the documents as HAL (Solr) answer pages"""
+
+    def __init__(self, docs, page_size=HAL_PAGE_SIZE):
+        self.pages = {}
+        starts = list(range(0, len(docs), page_size))
+        for idx, start in enumerate(starts + [len(docs)]):
+            cursor = f"page{idx}" if idx else "*"
+            # The last page is empty, with an unchanged cursor
+            next_cursor = f"page{idx + 1}" if idx < len(starts) else cursor
+            answer = {
+                "response": {
+                    "numFound": len(docs),
+                    "start": 0,
+                    "docs": docs[start : start + page_size],
+                },
+                "nextCursorMark": next_cursor,
+            }
+            self.pages[cursor] = json.dumps(answer, ensure_ascii=False).encode()
+
+    def post(self, _url, params):
+        """Returns the page of the cursor"""
+        return self.pages[params["cursorMark"]]
+
+
+def _prepare_hal(corpus):
+    publications = corpus["publications"]
+    fields = ",".join(publications[0])
+    return _SolrPages(publications), fields, tempfile.mkdtemp()
+
+
+def _run_hal(client, fields, cache_dir):
+    """
+    Parses the HAL answer pages into compact records, storing them
+    in the disk cache, and reads them back from the cache
+    """
+    saved = (webClient._CLIENT, hal._CACHE, dict(cache.SETTINGS))
+    webClient._CLIENT = client
+    hal._CACHE = cache.DiskCache("hal", cache_dir=cache_dir)
+    cache.SETTINGS.update(use_cache=True, refresh=False)
+    try:
+        n_records = 0
+        # The first query fills the cache, the second one reads it
+        for _ in range(2):
+            n_records += len(
+                hal.get_parsed(
+                    "collCode_s:SUBATECH docType_s:ART",
+                    fields,
+                    2000,
+                    page_size=HAL_PAGE_SIZE,
+                    compact=True,
+                )
+            )
+    finally:
+        webClient._CLIENT, hal._CACHE = saved[:2]
+        cache.SETTINGS.update(saved[2])
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    return n_records
+
+
+def _prepare_records(corpus):
+    return (corpus["publications"],)
+
+
+def _run_records(publications):
+    """Converts the articles to compact records"""
+    records = [hal.HalRecord(entry) for entry in publications]
+    return len(records)
+
+
+def _prepare_classify(corpus):
+    members_index = check_hal_untagged._get_members_index(
+        check_hal_untagged._get_members_dict(corpus["members"])
+    )
+    return (corpus["publications"], members_index)
+
+
+def _run_classify(publications, members_index):
+    """Classifies the articles without group tag as check_hal_untagged"""
+    check_hal_untagged._remove_accents.cache_clear()
+    check_hal_untagged._get_words.cache_clear()
+    entries = [
+        entry for entry in publications if not check_hal_untagged._has_group_tag(entry)
+    ]
+    grouped = list(check_hal_untagged._classify_entries(entries, members_index))
+    return len(grouped)
+
+
+def _prepare_yaml(corpus):
+    # pylint: disable-next=import-outside-toplevel
+    import yaml
+
+    return (yaml.safe_dump(corpus["local_events"], allow_unicode=True),)
+
+
+def _run_yaml(text):
+    """Parses the local conferences file"""
+    # pylint: disable-next=import-outside-toplevel
+    import yaml
+
+    yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return len(yaml.load(io.StringIO(text), Loader=yaml_loader))
+
+
+def _prepare_merge(corpus):
+    return copy.deepcopy((corpus["conferences"], corpus["local_events"]))
+
+
+def _run_merge(conferences, local_events):
+    """Builds and merges the events as confHandler.get_events"""
+    event_list = confHandler._get_hal_entries(GROUP, conferences) + local_events
+    merged = confHandler._merge_events(
+        sorted(event_list, key=lambda it: (it["start"], it["conference"]), reverse=True)
+    )
+    return len(merged)
+
+
+def _prepare_render(corpus):
+    publications, events = copy.deepcopy(
+        (corpus["publications"], corpus["local_events"])
+    )
+    events_year: dict = {}
+    for event in events:
+        year = generate_webpage_files.to_date(event["start"]).year
+        events_year.setdefault(year, []).append(event)
+    return publications, events_year
+
+
+def _run_render(publications, events_year):
+    """Builds and renders the publications and conferences pages"""
+    documents = [
+        generate_webpage_files.build_selected_pub(publications, 2000),
+        generate_webpage_files.build_conferences(events_year),
+    ]
+    n_bytes = 0
+    for document in documents:
+        for fmt in ["html", "mdx"]:
+            for lang in generate_webpage_files.LANGS:
+                body = io.StringIO()
+                formatter = generate_webpage_files.get_formatter(fmt, body)
+                docModel.render(document, formatter, lang)
+                n_bytes += len(body.getvalue())
+    return n_bytes
+
+
+STAGES = {
+    "hal": (_prepare_hal, _run_hal),
+    "records": (_prepare_records, _run_records),
+    "classify": (_prepare_classify, _run_classify),
+    "yaml": (_prepare_yaml, _run_yaml),
+    "merge": (_prepare_merge, _run_merge),
+    "render": (_prepare_render, _run_render),
+}
+
+
+def run_stage(name, corpus, measure_memory=True):
+    """
+    Runs the stage on the corpus and returns the measurements.
+    The time and the memory are measured in separate runs,
+    since tracing the allocations slows down the execution
+    """
+    prepare, run = STAGES[name]
+    # The stages print the duplicated contributions and missing information
+    with contextlib.redirect_stdout(io.StringIO()):
+        args = prepare(corpus)
+        start = time.perf_counter()
+        n_out = run(*args)
+        seconds = time.perf_counter() - start
+        peak = None
+        if measure_memory:
+            args = prepare(corpus)
+            tracemalloc.start()
+            run(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return {
+        "seconds": round(seconds, 4),
+        "peak_memory_mb": round(peak / 1e6, 2) if peak is not None else None,
+        "output": n_out,
+    }
+
+
+def run_benchmarks(sizes, stages, seed=0, max_authors=2000, measure_memory=True):
+    """Runs the stages for each corpus size and returns the results"""
+    results = []
+    for size in sizes:
+        print(f"Generate synthetic corpus of size {size}")
+        corpus = syntheticCorpus.make_corpus(size, seed, max_authors)
+        n_authors = sum(len(doc["authFullName_s"]) for doc in corpus["publications"])
+        for name in stages:
+            result = {"stage": name, "size": size, "authors": n_authors}
+            result.update(run_stage(name, corpus, measure_memory))
+            results.append(result)
+            print(
+                f"  {name:<10} {result['seconds']:>9.3f} s"
+                + (
+                    f" {result['peak_memory_mb']:>9.1f} MB"
+                    if result["peak_memory_mb"] is not None
+                    else ""
+                )
+            )
+    return results
+
+
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Benchmarks of the processing stages"
+    )
+    parser.add_argument(
+        "--sizes",
+        help="Number of documents of the synthetic corpora",
+        type=int,
+        nargs="+",
+        default=[1000, 10000],
+    )
+    parser.add_argument(
+        "--stages",
+        help="Stages to run",
+        choices=list(STAGES),
+        nargs="+",
+        default=list(STAGES),
+    )
+    parser.add_argument("--seed", help="Random seed", type=int, default=0)
+    parser.add_argument(
+        "--max-authors",
+        help="Maximum number of authors of collaboration papers",
+        dest="max_authors",
+        type=int,
+        default=2000,
+    )
+    parser.add_argument(
+        "--no-memory",
+        help="Do not measure the peak memory",
+        dest="measure_memory",
+        action="store_false",
+    )
+    parser.add_argument(
+        "--output", help="Output file (json)", default="bench_output.json"
+    )
+
+    args = parser.parse_args(argv)
+    # Do not read nor write the cache of the local files
+    cache.SETTINGS["use_cache"] = False
+    results = run_benchmarks(
+        args.sizes, args.stages, args.seed, args.max_authors, args.measure_memory
+    )
+    with open(args.output, "w", encoding="utf-8") as out_file:
+        json.dump(
+            {
+                "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seed": args.seed,
+                "max_authors": args.max_authors,
+                "results": results,
+            },
+            out_file,
+            indent=2,
+        )
+    print("Results written to " + args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+
+"""
+Generates a synthetic corpus shaped like the HAL answers and the local files,
+to measure the scripts offline on data larger than the real one
+"""
+
+import json
+import gzip
+import random
+import datetime
+import argparse
+
+GROUPS = ["SUBATECH-PLASMA", "SUBATECH-ERDRE", "SUBATECH-PRISMA", "SUBATECH-THEO"]
+
+SUBATECH_INSTITUTES = [
+    "Laboratoire SUBATECH Nantes",
+    "Laboratoire de physique subatomique et des technologies associées",
+]
+
+COUNTRIES = ["fr", "ch", "de", "it", "us", "jp", "cn", "gb", "kr", "es"]
+
+_SYLLABLES = (
+    "ba be ca co da de du fa ga gi la le lo ma me mo na ni pa pi ra re ri sa se ta "
+    "to va vi zé rè tin tez mar ber son ard ier"
+).split()
+
+_WORDS = (
+    "heavy flavour production collisions quarkonium jet neutrino measurement pp "
+    "Pb-Pb p-Pb energy suppression flow muon detector calibration reactor spectrum "
+    "radiochemistry model hydrodynamic transport photoproduction forward rapidity LHC"
+).split()
+
+
+def _make_name(rnd, n_syllables=(2, 3)):
+    return "".join(
+        rnd.choice(_SYLLABLES) for _ in range(rnd.randint(*n_syllables))
+    ).capitalize()
+
+
+def _make_title(rnd, n_words=(4, 12)):
+    return " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(*n_words)))
+
+
+def make_people(n_people, rnd):
+    """Returns the list of (first name, last name) of the authors"""
+    return [(_make_name(rnd, (2, 2)), _make_name(rnd)) for _ in range(n_people)]
+
+
+def make_members(people, rnd):
+    """
+    Returns the lab members in the format of the members read from ldap:
+    {group: {lower case last name: {"ymin": ymin, "ymax": ymax}}}
+    """
+    members: dict = {group: {} for group in GROUPS}
+    for _, last_name in people:
+        ymin = rnd.choice([2000, 2005, 2010, 2015])
+        members[rnd.choice(GROUPS)][last_name.lower()] = {"ymin": ymin, "ymax": 2100}
+    return members
+
+
+def _make_auth_struct(idx, first_name, last_name, inst):
+    return (
+        f"{idx}-0_FacetSep_{first_name} {last_name}"
+        f"_JoinSep_{idx % 97}_FacetSep_{inst}"
+    )
+
+
+def make_publications(n_docs, members, others, rnd, max_authors=2000):
+    """
+    Returns the HAL articles with the fields used by the scripts.
+    One article out of ten is a collaboration paper with up to max_authors authors
+    """
+    docs = []
+    for idx in range(n_docs):
+        if rnd.random() < 0.1:
+            n_authors = rnd.randint(max(1, max_authors // 4), max_authors)
+        else:
+            n_authors = rnd.randint(1, 20)
+        n_lab = rnd.randint(1, min(5, n_authors))
+        lab = rnd.sample(members, n_lab)
+        lab_authors = set(lab)
+        authors = lab + [rnd.choice(others) for _ in range(n_authors - n_lab)]
+        rnd.shuffle(authors)
+        auth_structs = [
+            _make_auth_struct(
+                pos,
+                first,
+                last,
+                (
+                    rnd.choice(SUBATECH_INSTITUTES)
+                    if (first, last) in lab_authors
+                    else "CERN European Organization for Nuclear Research"
+                ),
+            )
+            for pos, (first, last) in enumerate(authors)
+        ]
+        collections = ["SUBATECH"]
+        if rnd.random() < 0.7:
+            collections.append(rnd.choice(GROUPS))
+        year = rnd.randint(2000, 2025)
+        doc = {
+            "docid": str(1000000 + idx),
+            "halId_s": f"hal-{idx:08d}",
+            "docType_s": "ART",
+            "collCode_s": collections,
+            "title_s": [_make_title(rnd)],
+            "authFullName_s": [f"{first} {last}" for first, last in authors],
+            "authIdHasPrimaryStructure_fs": auth_structs,
+            "producedDateY_i": year,
+            "journalTitle_s": rnd.choice(["Phys. Rev. C", "Phys. Lett. B", "JHEP"]),
+            "volume_s": str(rnd.randint(1, 900)),
+            "page_s": str(rnd.randint(1, 9999)),
+            "arxivId_s": f"{year % 100:02d}{rnd.randint(1, 12):02d}.{idx % 100000:05d}",
+        }
+        if rnd.random() < 0.8:
+            doc["doiId_s"] = f"10.1103/synthetic.{idx}"
+        docs.append(doc)
+    return docs
+
+
+def make_conferences(n_docs, people, rnd):
+    """
+    Returns the HAL conference contributions and the local events (conferences.yaml).
+    Several contributions share the same conference,
+    and some of the local contributions duplicate the HAL ones with a modified title
+    """
+    n_events = max(1, n_docs // 5)
+    events = []
+    for idx in range(n_events):
+        start = datetime.date(
+            rnd.randint(2015, 2025), rnd.randint(1, 12), rnd.randint(1, 25)
+        )
+        end = start + datetime.timedelta(days=rnd.randint(0, 5))
+        title = _make_title(rnd, (2, 5)).title()
+        events.append(
+            {
+                "conferenceTitle_s": f"{title} Workshop {idx}",
+                "conferenceStartDate_s": start.isoformat(),
+                "conferenceEndDate_s": end.isoformat(),
+                "city_s": _make_name(rnd),
+                "country_s": rnd.choice(COUNTRIES),
+                "publisherLink_s": [f"https://indico.example.org/event/{idx}"],
+                "audience_s": rnd.choice(["2", "3"]),
+            }
+        )
+
+    hal_entries = []
+    local_events = []
+    for idx in range(n_docs):
+        event = rnd.choice(events)
+        n_authors = rnd.randint(1, 4)
+        authors = rnd.sample(people, n_authors)
+        entry = dict(event)
+        entry.update(
+            {
+                "halId_s": f"hal-c{idx:08d}",
+                "docType_s": rnd.choice(["COMM", "POSTER"]),
+                "collCode_s": ["SUBATECH", rnd.choice(GROUPS)],
+                "title_s": [_make_title(rnd)],
+                "authFirstName_s": [first for first, _ in authors],
+                "authLastName_s": [last for _, last in authors],
+                "invitedCommunication_s": rnd.choice(["0", "1"]),
+            }
+        )
+        hal_entries.append(entry)
+        if rnd.random() < 0.2:
+            # Duplicated in the local file, with a slightly different title
+            words = entry["title_s"][0].split()
+            words[rnd.randrange(len(words))] = rnd.choice(_WORDS)
+            local_events.append(
+                {
+                    "conference": event["conferenceTitle_s"],
+                    "url": event["publisherLink_s"][0],
+                    "start": event["conferenceStartDate_s"],
+                    "end": event["conferenceEndDate_s"],
+                    "venue": f"{event['city_s']}, France",
+                    "contributions": [
+                        {
+                            "type": "Talk",
+                            "invited": False,
+                            "title": " ".join(words),
+                            "firstname": authors[0][0],
+                            "lastname": authors[0][1],
+                        }
+                    ],
+                }
+            )
+    return hal_entries, local_events
+
+
+def make_corpus(size, seed=0, max_authors=2000):
+    """
+    Returns the synthetic corpus with size articles and size conference contributions.
+    The corpus is a dictionary with the keys:
+    members, publications, conferences (HAL entries) and local_events
+    """
+    rnd = random.Random(seed)
+    n_members = 150
+    people = make_people(n_members + max(1000, max_authors), rnd)
+    members = people[:n_members]
+    conferences, local_events = make_conferences(size, members, rnd)
+    return {
+        "members": make_members(members, rnd),
+        "publications": make_publications(
+            size, members, people[n_members:], rnd, max_authors
+        ),
+        "conferences": conferences,
+        "local_events": local_events,
+    }
+
+
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Generates a synthetic HAL corpus"
+    )
+    parser.add_argument("--size", help="Number of documents", type=int, default=1000)
+    parser.add_argument("--seed", help="Random seed", type=int, default=0)
+    parser.add_argument(
+        "--max-authors",
+        help="Maximum number of authors of collaboration papers",
+        dest="max_authors",
+        type=int,
+        default=2000,
+    )
+    parser.add_argument(
+        "--output", help="Output file (gzip compressed json)", required=True
+    )
+
+    args = parser.parse_args(argv)
+    corpus = make_corpus(args.size, args.seed, args.max_authors)
+    with gzip.open(args.output, "wt", encoding="utf-8") as out_file:
+        json.dump(corpus, out_file, ensure_ascii=False)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+"""
+Single entry point of the bibliography scripts: biblio.py <command> [options].
+Only the module of the requested command is imported
+"""
+
+import sys
+import importlib
+
+# Command: (module, description)
+COMMANDS = {
+    "stats": ("show_stats", "Statistics of the HAL publications"),
+    "untagged": ("check_hal_untagged", "HAL entries without group tag"),
+    "outside-collab": (
+        "show_papers_outside_collab",
+        "Publications outside the collaborations",
+    ),
+    "generate": ("generate_webpage_files", "Generate the web pages"),
+    "sync": ("halMirror", "Synchronize the local mirror of the SUBATECH documents"),
+    "snapshot": ("snapshot", "Record or show the snapshots of the web responses"),
+}
+
+
+def print_usage(out_file=sys.stdout):
+    """Prints the list of commands"""
+    print("usage: biblio.py <command> [options]\n\ncommands:", file=out_file)
+    for command, (_, description) in COMMANDS.items():
+        print(f"  {command:<16} {description}", file=out_file)
+    print("\nRun biblio.py <command> -h for the options of the command", file=out_file)
+
+
+def main(argv=None):
+    """Runs the command and returns its return code"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ("-h", "--help"):
+        print_usage()
+        return 0
+    command, command_args = argv[0], argv[1:]
+    if command not in COMMANDS:
+        print(f"Unknown command: {command}\n", file=sys.stderr)
+        print_usage(sys.stderr)
+        return 2
+    module = importlib.import_module(COMMANDS[command][0])
+    return module.main(command_args, prog=f"biblio.py {command}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
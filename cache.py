@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+
+"""Persistent on-disk cache for the query results"""
+
+import os
+import gzip
+import json
+import time
+import threading
+import hashlib
+import contextlib
+
+DEFAULT_DIR = os.environ.get(
+    "BIBLIO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "biblio-subatech"),
+)
+
+# Global settings, set from the command line options
+SETTINGS = {"use_cache": True, "refresh": False}
+
+
+class DiskCache:
+    """
+    Stores the results as gzip-compressed json lines, one file per key.
+    The modification time of the file is the creation time of the entry
+    and is used for the time-to-live, while the access time is used
+    for the least-recently-used eviction when the cache exceeds max_size
+    """
+
+    def __init__(self, name, max_size=200 * 1024 * 1024, cache_dir=None):
+        self.directory = os.path.join(cache_dir or DEFAULT_DIR, name)
+        self.max_size = max_size
+
+    def _path(self, key):
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".jsonl.gz")
+
+    def _iter_lines(self, in_file):
+        with in_file:
+            for line in in_file:
+                yield json.loads(line)
+
+    def read(self, key, ttl):
+        """
+        Returns an iterator over the cached items,
+        or None if the key is not cached or expired
+        """
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        now = time.time()
+        if ttl is not None and now - stat.st_mtime > ttl:
+            return None
+        # The file can be evicted by another thread: this is a cache miss.
+        # Once opened, the file can be read even if it is removed
+        try:
+            # Mark as recently used, keeping the creation time
+            os.utime(path, (now, stat.st_mtime))
+            in_file = gzip.open(path, "rt", encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        return self._iter_lines(in_file)
+
+    @contextlib.contextmanager
+    def writer(self, key):
+        """
+        Context manager returning a function that appends one item to the entry.
+        The entry is only stored if the block completes,
+        so that a partial result never ends up in the cache
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as out_file:
+
+                def write(item):
+                    out_file.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+                yield write
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.evict()
+
+    def store(self, key, items):
+        """Stores a list of items"""
+        with self.writer(key) as write:
+            for item in items:
+                write(item)
+
+    def evict(self):
+        """Removes the least recently used entries until the size is below max_size"""
+        entries = []
+        total_size = 0
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if not dir_entry.name.endswith(".jsonl.gz"):
+                    continue
+                # The file can be removed meanwhile by another thread
+                with contextlib.suppress(FileNotFoundError):
+                    stat = dir_entry.stat()
+                    entries.append((stat.st_atime, stat.st_size, dir_entry.path))
+                    total_size += stat.st_size
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total_size -= size
+
+
+class KeyValueCache:
+    """
+    Stores small values for many keys in a single gzip-compressed json file.
+    The file is read when the cache is created and written by save.
+    Each value is stored with its creation time, so that the time-to-live
+    can be chosen by the caller depending on the value
+    """
+
+    def __init__(self, name, cache_dir=None):
+        directory = cache_dir or DEFAULT_DIR
+        self.filename = os.path.join(directory, name + ".json.gz")
+        self._items: dict = {}
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if os.path.exists(self.filename):
+            with gzip.open(self.filename, "rt", encoding="utf-8") as in_file:
+                self._items = json.load(in_file)
+
+    def get(self, key, ttl_function=None):
+        """
+        Returns the stored value, or None if not found or expired.
+        ttl_function returns the time-to-live (or None for no expiration) of the value
+        """
+        self._load()
+        item = self._items.get(key)
+        if item is None:
+            return None
+        created, value = item
+        ttl = ttl_function(value) if ttl_function else None
+        if ttl is not None and time.time() - created > ttl:
+            return None
+        return value
+
+    def set(self, key, value):
+        """Stores the value"""
+        self._load()
+        self._items[key] = [time.time(), value]
+
+    def save(self):
+        """Writes the stored values to disk"""
+        if not self._loaded:
+            return
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        tmp_path = f"{self.filename}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as out_file:
+            json.dump(self._items, out_file, ensure_ascii=False)
+        os.replace(tmp_path, self.filename)
@@ -4,10 +4,12 @@
 
 import sys
 import re
-import urllib
 import argparse
+import functools
 import unicodedata
 import hal
+import profiler
+import webClient
 
 
 def _extract_data_in_html_tag(html: str, tag: str, cl=None):
@@ -22,19 +24,19 @@ def _extract_data_in_html_tag(html: str, tag: str, cl=None):
 def _get_members_from_ldap() -> dict:
     """Gets the SUBATECH members and their group from LDAP"""
     print("Query member list from ldap")
-    with urllib.request.urlopen("https://annuaire.in2p3.fr/laboratory/11") as response:
-        html = response.read().decode()
-        authors = _extract_data_in_html_tag(html, "strong")
-        groups = _extract_data_in_html_tag(html, "td", "text-black-50")
+    html = webClient.get_client().get("https://annuaire.in2p3.fr/laboratory/11")
+    html = html.decode()
+    authors = _extract_data_in_html_tag(html, "strong")
+    groups = _extract_data_in_html_tag(html, "td", "text-black-50")
 
-        members: dict = {}
-        author_group = zip(authors, groups)
-        for author, grp in author_group:
-            group = "SUBATECH-" + grp
-            if group not in members:
-                members[group] = {}
-            members[group][author.lower()] = {"ymin": 2000, "ymax": 2100}
-        return members
+    members: dict = {}
+    author_group = zip(authors, groups)
+    for author, grp in author_group:
+        group = "SUBATECH-" + grp
+        if group not in members:
+            members[group] = {}
+        members[group][author.lower()] = {"ymin": 2000, "ymax": 2100}
+    return members
 
 
 def _get_members_dict(members: dict) -> dict:
@@ -56,16 +58,39 @@ def _get_members_dict(members: dict) -> dict:
     return members_regex
 
 
+# Member keys made of these characters are literal in the regex
+# and can be looked up by their first word
+_LITERAL_KEY_RE = re.compile(r"\w(?:[\w\s'-]*\w)?")
+_WORD_RE = re.compile(r"\w+")
+
+
+def _get_members_index(members_regex: dict) -> dict:
+    """
+    Index the members by the first word of their key.
+    Since the key is matched on word boundaries, a member can only match an author
+    whose name contains this word.
+    The members with keys that cannot be indexed are always checked
+    """
+    index: dict = {"members": list(members_regex.values()), "words": {}, "always": []}
+    for ordinal, author in enumerate(members_regex):
+        if _LITERAL_KEY_RE.fullmatch(author):
+            first_word = _WORD_RE.match(author).group().lower()
+            index["words"].setdefault(first_word, []).append(ordinal)
+        else:
+            index["always"].append(ordinal)
+    return index
+
+
 def _get_members_info() -> dict:
     """
-    Returns the members information from ldap
+    Returns the index of the members information from ldap
     """
     # Load the members from ldap
     members = _get_members_from_ldap()
 
     # Create a dictionary with author keys
     # and assign a list of groups and a regex to match the author in publication
-    return _get_members_dict(members)
+    return _get_members_index(_get_members_dict(members))
 
 
 def _has_group_tag(entry: dict) -> bool:
@@ -79,6 +104,7 @@ def _has_group_tag(entry: dict) -> bool:
     return False
 
 
+@functools.lru_cache(maxsize=None)
 def _remove_accents(input_str: str) -> str:
     """Remove accents"""
     return "".join(
@@ -88,11 +114,25 @@ def _remove_accents(input_str: str) -> str:
     )
 
 
-def _find_groups(auth: str, members_regex: dict, year: int) -> dict:
+@functools.lru_cache(maxsize=None)
+def _get_words(norm_auth: str) -> frozenset:
+    """Returns the lower case words of the author name"""
+    return frozenset(word.lower() for word in _WORD_RE.findall(norm_auth))
+
+
+def _get_candidates(norm_auth: str, members_index: dict) -> list:
+    """Returns the members that might match the author, in the original order"""
+    ordinals = list(members_index["always"])
+    for word in _get_words(norm_auth):
+        ordinals += members_index["words"].get(word, [])
+    return [members_index["members"][ordinal] for ordinal in sorted(ordinals)]
+
+
+def _find_groups(auth: str, members_index: dict, year: int) -> dict:
     """Find groups to which the author was affiliated at the time of publication"""
     matched_groups: dict = {}
     norm_auth = _remove_accents(auth)
-    for info in members_regex.values():
+    for info in _get_candidates(norm_auth, members_index):
         if info["re"].search(norm_auth):
             for group_info in info["groups"]:
                 if group_info["ymin"] <= year <= group_info["ymax"]:
@@ -107,7 +147,7 @@ def _find_groups(auth: str, members_regex: dict, year: int) -> dict:
 
 
 def _group_authors(
-    affiliated_authors: list[str], members_regex: dict, year: int
+    affiliated_authors: list[str], members_index: dict, year: int
 ) -> dict:
     """
     Matches the authors affiliated to SUBATECH in HAL
@@ -115,7 +155,7 @@ def _group_authors(
     """
     grouped: dict = {}
     for auth in affiliated_authors:
-        matched_groups = _find_groups(auth, members_regex, year)
+        matched_groups = _find_groups(auth, members_index, year)
         for group, authors in matched_groups.items():
             if not group in grouped:
                 grouped[group] = []
@@ -150,13 +190,15 @@ def _print_summary(untagged: dict) -> None:
                 print(out)
 
 
+_FACET_SEP = "_FacetSep_"
+_JOIN_SEP = "_JoinSep_"
+
+
 def _get_auth_inst(auth_struct: str) -> dict:
     """Extract the name and institute from the dedicated HAL field"""
-    f_sep = "_FacetSep_"
-    j_sep = "_JoinSep_"
-    name_start = auth_struct.find(f_sep) + len(f_sep)
-    name_end = auth_struct.find(j_sep)
-    lab_start = auth_struct.find(f_sep, name_start) + len(f_sep)
+    name_start = auth_struct.find(_FACET_SEP) + len(_FACET_SEP)
+    name_end = auth_struct.find(_JOIN_SEP)
+    lab_start = auth_struct.find(_FACET_SEP, name_start) + len(_FACET_SEP)
     return {"author": auth_struct[name_start:name_end], "inst": auth_struct[lab_start:]}
 
 
@@ -164,26 +206,28 @@ def _get_affiliated_authors(
     auth_struct_list: list[str], inst_list: list[str]
 ) -> list[str]:
     """Get the list of authors that are affiliated to one institute in the list in HAL"""
+    # The institute ends the field: skip the other authors of large collaborations
+    # without parsing them
+    suffixes = tuple(_FACET_SEP + inst for inst in inst_list)
     affiliated = []
     for auth_struct in auth_struct_list:
+        if not auth_struct.endswith(suffixes):
+            continue
         auth_inst = _get_auth_inst(auth_struct)
         if auth_inst["inst"] in inst_list:
             affiliated.append(auth_inst["author"])
     return affiliated
 
 
-def _compare_entries(to_check: list[dict], reference: list[dict], title: str) -> None:
-    """Compares the entries"""
-    missing = []
-    for entry in sorted(reference, key=lambda item: item["halId_s"]):
-        if entry not in to_check:
-            missing.append(entry)
+def _compare_entries(to_check: dict, reference: dict, title: str) -> None:
+    """Compares the entries indexed by HAL id"""
+    missing = sorted(reference.keys() - to_check.keys())
 
     if missing:
         print("\n" + title)
-        for entry in missing:
-            out = "  " + entry["halId_s"]
-            out += '  title: "' + entry["title_s"][0] + '"'
+        for hal_id in missing:
+            out = "  " + hal_id
+            out += '  title: "' + reference[hal_id]["title_s"][0] + '"'
             print(out)
 
 
@@ -210,6 +254,7 @@ def _get_hal_biblio(ymin: int, ymax: int) -> list:
         ",".join(fields),
         ymin,
         ymax,
+        compact=True,
     )
 
     # Search the SUBATECH collection
@@ -218,79 +263,147 @@ def _get_hal_biblio(ymin: int, ymax: int) -> list:
         ",".join(fields),
         ymin,
         ymax,
+        compact=True,
     )
 
     # Compare the collections
-    _compare_entries(tagged, entries, "NOT IN SUBATECH COLLECTION:")
-    _compare_entries(entries, tagged, "MISSING AFFILIATION IN METADATA:")
+    entries_by_id = {entry["halId_s"]: entry for entry in entries}
+    tagged_by_id = {entry["halId_s"]: entry for entry in tagged}
+    _compare_entries(tagged_by_id, entries_by_id, "NOT IN SUBATECH COLLECTION:")
+    _compare_entries(entries_by_id, tagged_by_id, "MISSING AFFILIATION IN METADATA:")
 
     # Merge the collections
-    for entry in tagged:
-        if entry not in entries:
-            entries.append(entry)
+    for hal_id, entry in tagged_by_id.items():
+        entries_by_id.setdefault(hal_id, entry)
+
+    return list(entries_by_id.values())
+
+
+def _classify_entry(entry: dict, members_index: dict) -> dict:
+    """Returns the authors of the entry affiliated to SUBATECH split in groups"""
+    # Extract the list of authors affiliated with SUBATECH
+    affiliated_authors = _get_affiliated_authors(
+        entry["authIdHasPrimaryStructure_fs"],
+        [
+            "Laboratoire SUBATECH Nantes",
+            "Laboratoire de physique subatomique et des technologies associées",
+        ],
+    )
+
+    year = int(entry["producedDateY_i"])
+
+    # Split authors in groups
+    grouped = _group_authors(affiliated_authors, members_index, year)
+
+    # If some authors match a group, remove authors matching no group
+    # (since they probably left the group)
+    if "UNKNOWN" in grouped and len(grouped) > 1:
+        del grouped["UNKNOWN"]
+    return grouped
+
 
-    return entries
+# Members index of the worker processes (see _init_worker)
+_WORKER_MEMBERS_INDEX: dict = {}
 
 
-def check_hal_untagged(ymin: int, ymax: int) -> None:
+def _init_worker(members_index: dict) -> None:
+    """Stores the members index once in each worker process"""
+    _WORKER_MEMBERS_INDEX.update(members_index)
+
+
+def _classify_entry_in_worker(entry: dict) -> dict:
+    """Classifies the entry with the members index of the worker"""
+    return _classify_entry(entry, _WORKER_MEMBERS_INDEX)
+
+
+def _classify_entries(entries: list, members_index: dict, jobs=None):
+    """
+    Yields the classification of the entries in the same order.
+    With several jobs, the entries are classified in chunks by a process pool
+    """
+    if not jobs or jobs <= 1:
+        for entry in entries:
+            yield _classify_entry(entry, members_index)
+        return
+    # pylint: disable-next=import-outside-toplevel
+    import concurrent.futures
+
+    chunk_size = max(1, len(entries) // (4 * jobs))
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(members_index,)
+    ) as executor:
+        yield from executor.map(
+            _classify_entry_in_worker, entries, chunksize=chunk_size
+        )
+
+
+def check_hal_untagged(ymin: int, ymax: int, jobs=None) -> None:
     """
     Main function: checks for entries in HAL that are tagged as SUBATECH
     but not tagged for a sub-group
     """
 
-    members_regex = _get_members_info()
-
-    entries = _get_hal_biblio(ymin, ymax)
+    with profiler.stage("Members from ldap") as info:
+        members_index = _get_members_info()
+        info["records"] = len(members_index["members"])
+
+    with profiler.stage("HAL collections") as info:
+        entries = _get_hal_biblio(ymin, ymax)
+        info["records"] = len(entries)
+
+    # Do nothing if the entry has at least one tagged SUBATECH group
+    # CAVEAT: there might be publications involving several
+    # groups that would not be matched in this way,
+    # But the number of fake positive is so large that it is better to neglect this case
+    to_classify = [
+        entry
+        for entry in sorted(entries, key=lambda item: item["halId_s"])
+        if not _has_group_tag(entry)
+    ]
 
     # Loop on entries
     untagged = {}
-    for entry in sorted(entries, key=lambda item: item["halId_s"]):
-        # Do nothing if the entry has at least one tagged SUBATECH group
-        # CAVEAT: there might be publications involving several
-        # groups that would not be matched in this way,
-        # But the number of fake positive is so large that it is better to neglect this case
-        if _has_group_tag(entry):
-            continue
-
-        # Extract the list of authors affiliated with SUBATECH
-        affiliated_authors = _get_affiliated_authors(
-            entry["authIdHasPrimaryStructure_fs"],
-            [
-                "Laboratoire SUBATECH Nantes",
-                "Laboratoire de physique subatomique et des technologies associées",
-            ],
-        )
-
-        year = int(entry["producedDateY_i"])
-
-        # Split authors in groups
-        grouped = _group_authors(affiliated_authors, members_regex, year)
-
-        # If some authors match a group, remove authors matching no group
-        # (since they probably left the group)
-        if "UNKNOWN" in grouped and len(grouped) > 1:
-            del grouped["UNKNOWN"]
-
-        for group, authors in grouped.items():
-            if not group in untagged:
-                untagged[group] = []
-            untagged[group].append(
-                {
-                    "id": entry["halId_s"],
-                    "title": entry["title_s"][0],
-                    "authors": authors,
-                    "doc_type": entry["docType_s"],
-                }
-            )
+    with profiler.stage("Classify entries") as info:
+        info["records"] = len(to_classify)
+        for entry, grouped in zip(
+            to_classify, _classify_entries(to_classify, members_index, jobs)
+        ):
+            for group, authors in grouped.items():
+                if not group in untagged:
+                    untagged[group] = []
+                untagged[group].append(
+                    {
+                        "id": entry["halId_s"],
+                        "title": entry["title_s"][0],
+                        "authors": authors,
+                        "doc_type": entry["docType_s"],
+                    }
+                )
     _print_summary(untagged)
     return 0
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Utility for bibliography")
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    parser = argparse.ArgumentParser(prog=prog, description="Utility for bibliography")
     parser.add_argument("--ymin", help="Minimum year", type=int, default="2010")
     parser.add_argument("--ymax", help="Maximum year", type=int, default="2100")
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="Number of processes used to classify the entries",
+        type=int,
+    )
+    hal.add_arguments(parser)
+    profiler.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    hal.configure(args)
+    profiler.configure(args)
+    ret_code = check_hal_untagged(args.ymin, args.ymax, args.jobs)
+    profiler.report()
+    return ret_code
 
-    args = parser.parse_args()
-    RET_CODE = check_hal_untagged(args.ymin, args.ymax)
-    sys.exit(RET_CODE)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,62 +2,120 @@
 
 """Module to properly read and format the conference information"""
 
-import csv
 import os
 import re
-import json
-import yaml
+import unicodedata
 import hal
+import loader
+import profiler
 
+# Minimal similarity of the titles (Jaccard index of the sets of words)
+# for two contributions of the same author to be considered as duplicated
+DUPLICATE_THRESHOLD = 0.5
 
-def _is_same_title(title, ref_title):
-    words = title.split(" ")
-    n_words = len(words)
-    n_found = 0
-    for word in words:
-        if word in ref_title:
-            n_found += 1
-    return float(n_found) / float(n_words) > 0.6
-
-
-def _check_duplicated(contrib, merged_contributions):
-    for merged in merged_contributions:
-        if contrib.get("lastname") and merged.get("lastname"):
-            if contrib["lastname"] == merged["lastname"]:
-                if _is_same_title(contrib["title"], merged["title"]):
-                    # The contribution is already present
-                    # Let us add any additional information
-                    # that might be present in the second contribution
-                    for key in contrib.keys():
-                        if key not in merged:
-                            merged[key] = contrib[key]
-                    return True
-    return False
-
-
-def _add_contribution(event, merged_list):
+
+def _normalize(text):
+    """Returns the lower case text without accents"""
+    return "".join(
+        c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn"
+    ).lower()
+
+
+def _title_tokens(title):
+    """Returns the set of normalized words in the title"""
+    return frozenset(re.findall(r"\w+", _normalize(title)))
+
+
+def _jaccard(tokens, ref_tokens):
+    if not tokens or not ref_tokens:
+        return 0.0
+    return len(tokens & ref_tokens) / len(tokens | ref_tokens)
+
+
+def _index_contribution(contrib, contrib_index):
+    """Adds the contribution to the index of the contributions by last name"""
+    lastname = contrib.get("lastname")
+    if not lastname:
+        return
+    contrib_index.setdefault(_normalize(lastname).strip(), []).append(
+        (_title_tokens(contrib.get("title", "")), contrib)
+    )
+
+
+def _check_duplicated(contrib, contrib_index, threshold):
+    """
+    Searches the contribution among the merged contributions
+    with the same normalized last name.
+    Returns the reason why it is considered as duplicated, or None
+    """
+    lastname = contrib.get("lastname")
+    if not lastname:
+        return None
+    tokens = _title_tokens(contrib.get("title", ""))
+    for merged_tokens, merged in contrib_index.get(_normalize(lastname).strip(), []):
+        similarity = _jaccard(tokens, merged_tokens)
+        if similarity >= threshold:
+            # The contribution is already present
+            # Let us add any additional information
+            # that might be present in the second contribution
+            for key in contrib.keys():
+                if key not in merged:
+                    merged[key] = contrib[key]
+            return f"same last name {lastname}, title similarity {similarity:.2f}"
+    return None
+
+
+def _find_merged_event(event, index):
+    """
+    Returns the position of the first merged event with the same start
+    and the same end, or with no end if one of the two events has no end
+    """
+    start = event["start"]
+    end = event.get("end") or None
+    if end is None:
+        return index["start"].get(start)
+    candidates = [
+        pos
+        for pos in (index["dates"].get((start, end)), index["dates"].get((start, None)))
+        if pos is not None
+    ]
+    return min(candidates) if candidates else None
+
+
+def _add_contribution(event, merged_list, index, threshold):
     # Add the contributions
-    for merged_event in merged_list:
-        if event["start"] == merged_event["start"]:
-            end1 = event.get("end")
-            end2 = merged_event.get("end")
-            if end1 and end2 and (end1 != end2):
-                continue
-            for contrib in event["contributions"]:
-                if _check_duplicated(contrib, merged_event["contributions"]):
-                    print("Duplicated contribution:")
-                    print(contrib)
-                else:
-                    merged_event["contributions"].append(contrib)
-            return
+    pos = _find_merged_event(event, index)
+    if pos is not None:
+        merged_event = merged_list[pos]
+        contrib_index = index["contributions"].get(pos)
+        if contrib_index is None:
+            contrib_index = {}
+            for merged in merged_event["contributions"]:
+                _index_contribution(merged, contrib_index)
+            index["contributions"][pos] = contrib_index
+        for contrib in event["contributions"]:
+            reason = _check_duplicated(contrib, contrib_index, threshold)
+            if reason:
+                print(f"Duplicated contribution ({reason}):")
+                print(contrib)
+            else:
+                merged_event["contributions"].append(contrib)
+                _index_contribution(contrib, contrib_index)
+        return
+    pos = len(merged_list)
     merged_list.append(event)
+    index["dates"].setdefault((event["start"], event.get("end") or None), pos)
+    index["start"].setdefault(event["start"], pos)
 
 
-def _merge_events(event_list):
+def _merge_events(event_list, threshold=DUPLICATE_THRESHOLD):
     # Merges the contributions in the same event
+    # The merged events are indexed by (start, end) and by start,
+    # and their contributions by normalized last name
     merged_list = []
+    index = {"dates": {}, "start": {}, "contributions": {}}
     for event in event_list:
-        _add_contribution(event, merged_list)
+        _add_contribution(event, merged_list, index, threshold)
     for event in merged_list:
         # sort
         contributions = event.get("contributions")
@@ -81,16 +139,37 @@ def _get_meeting_type(title):
     return "Conference"
 
 
-def _read_country_map():
+def _get_country_codes_filename():
     # File taken from https://github.com/lukes/ISO-3166-Countries-with-Regional-Codes/blob/master/all/all.csv
     script_dir = os.path.dirname(os.path.realpath(__file__))
-    filename = os.path.join(script_dir, "utils/country_codes.csv")
+    return os.path.join(script_dir, "utils/country_codes.csv")
+
+
+def _get_patch_filename(group):
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(script_dir, f"groups/{group}/conferences_patch_hal.json")
+
+
+def _get_yaml_filename(group):
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(script_dir, f"groups/{group}/conferences.yaml")
+
+
+def get_input_filenames(group):
+    """Returns the local files used to build the events"""
+    return [
+        _get_yaml_filename(group),
+        _get_patch_filename(group),
+        _get_country_codes_filename(),
+    ]
+
+
+def _read_country_map():
+    filename = _get_country_codes_filename()
     country_map = {}
-    with open(filename, encoding="utf-8") as in_file:
-        rdr = csv.reader(in_file)
-        for row in rdr:
-            country_map[row[1].lower()] = row[0]
-        return country_map
+    for row in loader.load_csv(filename):
+        country_map[row[1].lower()] = row[0]
+    return country_map
 
 
 def _get_country_map():
@@ -101,17 +180,15 @@ def _get_country_map():
 
 
 def _read_hal_patch(group):
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    filename = os.path.join(script_dir, f"groups/{group}/conferences_patch_hal.json")
+    filename = _get_patch_filename(group)
 
     if os.path.exists(filename):
-        with open(filename, encoding="utf-8") as in_file:
-            infos = json.load(in_file)
-            info_dict = {}
-            for info in infos["patches"]:
-                for id_dict in info["ids"]:
-                    info_dict[id_dict] = {k: v for k, v in info.items() if k != "ids"}
-            return info_dict
+        infos = loader.load_json(filename)
+        info_dict = {}
+        for info in infos["patches"]:
+            for id_dict in info["ids"]:
+                info_dict[id_dict] = {k: v for k, v in info.items() if k != "ids"}
+        return info_dict
     return None
 
 
@@ -126,24 +203,29 @@ def _patch_hal(group, entries):
         author = entry["authLastName_s"][0]
         for key, val in spell_changes.items():
             if key in author:
-                entry["authLastName_s"][0] = val
+                entry["authLastName_s"] = [val, *entry["authLastName_s"][1:]]
+        yield entry
+
 
+def get_hal_query(group):
+    """Returns the arguments of the HAL query for the conference contributions"""
+    return (
+        f"collCode_s:{group} AND (docType_s:COMM OR docType_s:POSTER)",
+        "halId_s,conferenceStartDate_s,conferenceEndDate_s,conferenceTitle_s,title_s,city_s,country_s,publisherLink_s,audience_s,authFirstName_s,authLastName_s,invitedCommunication_s,docType_s,doiId_s,arxivId_s,collCode_s",
+        2015,
+    )
 
-def _get_hal_entries(group):
+
+def _get_hal_entries(group, entries=None):
     # Parse the json file from HAL
     audience_map = {"2": "International", "3": "National"}
 
     # This could be done with pycountry
     country_map = _get_country_map()
     event_list = []
-    query_str = f"collCode_s:{group} AND (docType_s:COMM OR docType_s:POSTER)"
-    entries = hal.get_parsed(
-        query_str,
-        "halId_s,conferenceStartDate_s,conferenceEndDate_s,conferenceTitle_s,title_s,city_s,country_s,publisherLink_s,audience_s,authFirstName_s,authLastName_s,invitedCommunication_s,docType_s,doiId_s,arxivId_s",
-        2015,
-    )
-    _patch_hal(group, entries)
-    for entry in entries:
+    if entries is None:
+        entries = hal.iter_parsed(*get_hal_query(group))
+    for entry in _patch_hal(group, entries):
         # Get conference info
         if "ignored" in entry:
             continue
@@ -209,18 +291,24 @@ def _get_hal_entries(group):
     return event_list
 
 
-def get_events(group):
-    """Formats the events"""
-    event_list = _get_hal_entries(group)
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    yaml_filename = os.path.join(script_dir, f"groups/{group}/conferences.yaml")
-    with open(yaml_filename, encoding="utf-8") as in_file:
-        event_list += list(yaml.safe_load(in_file.read()))
+def get_events(group, hal_entries=None, threshold=DUPLICATE_THRESHOLD):
+    """
+    Formats the events.
+    The HAL entries are queried unless they are provided.
+    The threshold is the minimal title similarity of duplicated contributions
+    """
+    event_list = _get_hal_entries(group, hal_entries)
+    event_list += list(loader.load_yaml(_get_yaml_filename(group)))
 
     # Merge the events
-    merged_events = _merge_events(
-        sorted(event_list, key=lambda it: (it["start"], it["conference"]), reverse=True)
-    )
+    with profiler.stage("Merge events") as info:
+        merged_events = _merge_events(
+            sorted(
+                event_list, key=lambda it: (it["start"], it["conference"]), reverse=True
+            ),
+            threshold,
+        )
+        info["records"] = len(event_list)
 
     return merged_events
 
@@ -233,8 +321,15 @@ if __name__ == "__main__":
     parser.add_argument(
         "--group", help="Group", dest="group", default="SUBATECH-PLASMA"
     )
+    parser.add_argument(
+        "--duplicate-threshold",
+        help="Minimal title similarity of duplicated contributions",
+        dest="threshold",
+        type=float,
+        default=DUPLICATE_THRESHOLD,
+    )
 
     args = parser.parse_args()
-    events = get_events(args.group)
+    events = get_events(args.group, threshold=args.threshold)
     print(events)
     sys.exit(0)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+
+"""
+Format- and language-independent document model.
+The document tree is built once from the data,
+and then rendered with a formatter for each language and output format
+"""
+
+
+class Node:
+    """Base node of the document tree"""
+
+    def __init__(self, *children):
+        self.children = list(children)
+
+    def append(self, child):
+        """Append a child node"""
+        self.children.append(child)
+        return child
+
+
+class Document(Node):
+    """Sequence of blocks (headers and lists)"""
+
+
+class Text(Node):
+    """
+    Plain text.
+    The text is either a string or a dictionary with one string per language
+    """
+
+    def __init__(self, text):
+        super().__init__()
+        self.text = text
+
+
+class Emph(Node):
+    """Emphasized (italics) text"""
+
+
+class Link(Node):
+    """Link to ref"""
+
+    def __init__(self, ref, *children):
+        super().__init__(*children)
+        self.ref = ref
+
+
+class Header(Node):
+    """Header of the given level"""
+
+    def __init__(self, level, *children):
+        super().__init__(*children)
+        self.level = level
+
+
+class List(Node):
+    """List of items of the given level"""
+
+    def __init__(self, *children, level=1):
+        super().__init__(*children)
+        self.level = level
+
+
+class Item(Node):
+    """
+    List item.
+    A nested list is attached to the end of the item
+    """
+
+
+def _translate(text, lang):
+    if isinstance(text, dict):
+        return text[lang]
+    return text
+
+
+def _render_inline(nodes, formatter, lang):
+    """Returns the formatted text of the inline nodes"""
+    out = []
+    for node in nodes:
+        if isinstance(node, Text):
+            out.append(_translate(node.text, lang))
+        elif isinstance(node, Emph):
+            text = _render_inline(node.children, formatter, lang)
+            out.append(formatter.text_it(text))
+        elif isinstance(node, Link):
+            text = _render_inline(node.children, formatter, lang)
+            out.append(formatter.link(node.ref, text))
+        elif isinstance(node, List):
+            out.append("".join(_iter_blocks(node, formatter, lang)).rstrip())
+        else:
+            raise TypeError(f"Unexpected inline node {type(node).__name__}")
+    return "".join(out)
+
+
+def _iter_blocks(node, formatter, lang):
+    """Yields the formatted chunks of the block node"""
+    if isinstance(node, Document):
+        for child in node.children:
+            yield from _iter_blocks(child, formatter, lang)
+    elif isinstance(node, Header):
+        yield formatter.header(
+            _render_inline(node.children, formatter, lang), node.level
+        )
+    elif isinstance(node, List):
+        yield formatter.list_start(node.level)
+        for item in node.children:
+            yield formatter.list_item(
+                _render_inline(item.children, formatter, lang), node.level
+            )
+        yield formatter.list_end(node.level)
+    else:
+        raise TypeError(f"Unexpected block node {type(node).__name__}")
+
+
+def render(document, formatter, lang):
+    """Writes the document in the chosen language with the formatter"""
+    for chunk in _iter_blocks(document, formatter, lang):
+        formatter.write(chunk)
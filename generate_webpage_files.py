@@ -2,18 +2,44 @@
 
 """Script to generate the subatech-next webpage files"""
 
+import io
 import os
 import sys
+import shutil
 import argparse
 import datetime
-import yaml
 import hal
+import loader
+import docModel
+import manifest
+import profiler
 import confHandler
 
+# Version of the output formatting.
+# Increase it when the output changes for the same inputs
+FORMATTER_VERSION = 1
+
+LANGS = ["en", "fr"]
+
 # Formatters
 
 
-class MDFormatter:
+class Formatter:
+    """
+    Base class of the formatters.
+    The formatting methods return the chunks of text,
+    which are appended to the output stream with write
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, chunk):
+        """Append chunk to the output stream"""
+        self.stream.write(chunk)
+
+
+class MDFormatter(Formatter):
     """Class to format output in Markdown"""
 
     def header(self, name, level):
@@ -81,7 +107,7 @@ class MDFormatter:
         return "[" + name + "](" + ref + ")"
 
 
-class HTMLFormatter:
+class HTMLFormatter(Formatter):
     """Class to format output in HTML"""
 
     def header(self, name, level):
@@ -145,11 +171,11 @@ class HTMLFormatter:
         return '<a href="' + ref + '">' + name + "</a>"
 
 
-def get_formatter(fmt):
-    """Return the formatter"""
+def get_formatter(fmt, stream):
+    """Return the formatter writing to the stream"""
     if fmt == "mdx":
-        return MDFormatter()
-    return HTMLFormatter()
+        return MDFormatter(stream)
+    return HTMLFormatter(stream)
 
 
 def get_page_header_lines(title):
@@ -199,27 +225,42 @@ def generate_test_page(in_filename, out_filename):
             out_file.write("</html>\n")
 
 
-def read_mdx(filename):
-    """Read markdown for javascript"""
+def read_mdx_header(filename):
+    """Read the header lines of the markdown for javascript"""
     if not os.path.exists(filename):
-        return {}
+        return []
     with open(filename, encoding="utf-8") as in_file:
-        fcontent = in_file.readlines()
-        return {"header_lines": fcontent[0:6], "body_lines": fcontent[6:]}
+        return [line for _, line in zip(range(6), in_file)]
 
 
-def dump_to_file(out_filename, title, txt, fmt):
-    """Dump content to file"""
+def is_same_body(filename, body, chunk_size=65536):
+    """Compares chunk by chunk the body of the mdx file with the generated body"""
+    if not os.path.exists(filename):
+        return False
+    body.seek(0)
+    with open(filename, encoding="utf-8") as in_file:
+        # Skip the header
+        for _ in range(6):
+            in_file.readline()
+        is_empty = True
+        while True:
+            chunk = body.read(chunk_size)
+            if chunk != in_file.read(len(chunk)):
+                return False
+            if not chunk:
+                # Empty bodies are always rewritten
+                return not is_empty and not in_file.read(1)
+            is_empty = False
+
+
+def dump_to_file(out_filename, title, body, fmt):
+    """Dump the content of the body stream to file"""
     header_lines = []
     if fmt == "mdx":
-        mdx_dict = read_mdx(out_filename)
-        body_lines = mdx_dict.get("body_lines")
-        if body_lines:
-            body = "".join(body_lines)
-            if body == txt:
-                print("No changes in " + out_filename)
-                return
-        header_lines = mdx_dict.get("header_lines")
+        if is_same_body(out_filename, body):
+            print("No changes in " + out_filename)
+            return
+        header_lines = read_mdx_header(out_filename)
         header_update = get_page_header_lines(title)
         if header_lines:
             header_lines[1] = header_update[1]
@@ -229,7 +270,8 @@ def dump_to_file(out_filename, title, txt, fmt):
         print("Writing " + out_filename)
         if header_lines:
             out_file.write("".join(header_lines))
-        out_file.write(txt)
+        body.seek(0)
+        shutil.copyfileobj(body, out_file)
 
     if fmt == "html":
         generate_test_page(out_filename, "test_" + out_filename)
@@ -238,29 +280,56 @@ def dump_to_file(out_filename, title, txt, fmt):
 # Publications
 
 
+def get_tagged_pub_filename(group):
+    """Returns the file with selected publications"""
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(script_dir, f"groups/{group}/selected_publications.yaml")
+
+
 def read_tagged_pub(group):
     """Read file with selected publications"""
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    filename = os.path.join(script_dir, f"groups/{group}/selected_publications.yaml")
-    with open(filename, encoding="utf-8") as in_file:
-        return yaml.safe_load(in_file.read())
+    return loader.load_yaml(get_tagged_pub_filename(group))
+
+
+def get_tagged_ids(tags):
+    """Returns the DOIs and arXiv ids of the selected publications"""
+    dois = []
+    arxiv_ids = []
+    for tag in tags:
+        if tag.endswith("_title"):
+            continue
+        if tag.startswith("10."):
+            dois.append(tag)
+        else:
+            arxiv_ids.append(tag)
+    return dois, arxiv_ids
 
 
 def get_selected(entries, group):
-    """Returns the selected publications"""
+    """
+    Returns the selected publications.
+    The tags that match none of the entries are reported
+    """
     tags = read_tagged_pub(group)
     filtered = []
+    matched = set()
     for entry in entries:
         checks = [hal.get_eprint(entry.get("arxivId_s")), entry.get("doiId_s")]
-        for val in checks:
-            if val and val in tags:
-                sel = entry
-                sel["selected"] = tags[val]
-                new_title = tags.get(val + "_title")
-                if new_title:
-                    sel["title_s"][0] = new_title
-                filtered.append(sel)
-                break
+        found = [val for val in checks if val and val in tags]
+        matched.update(found)
+        if found:
+            sel = entry
+            sel["selected"] = tags[found[0]]
+            new_title = tags.get(found[0] + "_title")
+            if new_title:
+                sel["title_s"] = [new_title, *sel["title_s"][1:]]
+            filtered.append(sel)
+    missing = [tag for tag in sum(get_tagged_ids(tags), []) if tag not in matched]
+    if missing:
+        print(
+            f"Caveat: {len(missing)} selected publications not found in HAL: "
+            + ", ".join(missing)
+        )
     return filtered
 
 
@@ -272,9 +341,9 @@ def get_author(entry):
     return " and ".join(authors)
 
 
-def get_journal(entry, formatter):
-    """Returns the journal type"""
-    out = ""
+def get_journal(entry):
+    """Returns the document nodes of the journal reference"""
+    nodes = []
     journal = entry.get("journalTitle_s")
     if journal:
         volume = entry.get("volume_s")
@@ -284,21 +353,26 @@ def get_journal(entry, formatter):
         pages = entry.get("page_s")
         if pages:
             journal += " " + pages
-        out += journal
+        nodes.append(docModel.Text(journal))
     doi = entry.get("doiId_s")
     if doi:
-        out += " " + formatter.link("https://doi.org/" + doi, "doi:" + doi)
+        nodes.append(docModel.Text(" "))
+        nodes.append(
+            docModel.Link("https://doi.org/" + doi, docModel.Text("doi:" + doi))
+        )
 
     arxiv = entry.get("arxivId_s")
     if arxiv:
-        if out:
-            out += " "
-        out += (
-            "["
-            + formatter.link("https://arxiv.org/abs/" + arxiv, f"arXiv:{arxiv}")
-            + "]"
+        if nodes:
+            nodes.append(docModel.Text(" "))
+        nodes.append(docModel.Text("["))
+        nodes.append(
+            docModel.Link(
+                "https://arxiv.org/abs/" + arxiv, docModel.Text(f"arXiv:{arxiv}")
+            )
         )
-    return out
+        nodes.append(docModel.Text("]"))
+    return nodes
 
 
 def to_date(date_str):
@@ -306,174 +380,340 @@ def to_date(date_str):
     return datetime.datetime.strptime(date_str, "%Y-%m-%d").date()
 
 
-def generate_selected_pub(group, fmt, ymin, subaweb_dir):
-    """Generates the list of selected publications in the chosen language"""
-    entries = hal.get_parsed(
-        f"collCode_s:{group} docType_s:ART",
-        "halId_s,authFullName_s,collaboration_s,title_s,arxivId_s,doiId_s,journalTitle_s,volume_s,number_s,page_s,producedDateY_i",
-        ymin,
+def get_out_filenames(group, fmts, name, subaweb_dir):
+    """Returns the output filenames for all languages and formats"""
+    return [
+        get_out_filename(group, fmt, name, subaweb_dir, lang)
+        for fmt in fmts
+        for lang in LANGS
+    ]
+
+
+def get_fingerprint(hal_entries, filenames, **extra):
+    """
+    Returns the fingerprint of the inputs of a page,
+    including the formatter version and the code used for the rendering
+    """
+    code_files = [__file__, docModel.__file__, confHandler.__file__]
+    return manifest.fingerprint(
+        hal_entries,
+        list(filenames) + code_files,
+        formatter_version=FORMATTER_VERSION,
+        **extra,
     )
 
-    selected = get_selected(entries, group)
 
-    formatter = get_formatter(fmt)
+def is_up_to_date(page_manifest, out_filenames, input_fingerprint):
+    """Checks in the manifest (if any) if the outputs can be skipped"""
+    if page_manifest is None:
+        return False
+    if page_manifest.is_up_to_date(out_filenames, input_fingerprint):
+        print("Skipped (inputs unchanged): " + ", ".join(out_filenames))
+        return True
+    return False
+
+
+def render_to_files(document, group, fmts, name, subaweb_dir, titles):
+    """
+    Renders the document in each language and output format,
+    and dumps it to file. titles contains the page title per language
+    """
+    with profiler.stage(f"Render {name}") as info:
+        info["records"] = len(fmts) * len(titles)
+        for fmt in fmts:
+            for lang, title in titles.items():
+                body = io.StringIO()
+                docModel.render(document, get_formatter(fmt, body), lang)
+                out_filename = get_out_filename(group, fmt, name, subaweb_dir, lang)
+                dump_to_file(out_filename, title, body, fmt)
+
+
+PUB_FIELDS = "docid,halId_s,title_s,arxivId_s,doiId_s,journalTitle_s,volume_s,number_s,page_s,producedDateY_i,collCode_s"
+
+
+def _quote(value):
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"'
+
+
+def get_ids_clause(dois, arxiv_ids):
+    """Returns the query clause matching any of the DOIs or arXiv ids"""
+    clauses = []
+    if dois:
+        clauses.append(f"doiId_s:({' OR '.join(_quote(doi) for doi in dois)})")
+    for arxiv_id in arxiv_ids:
+        if "." not in arxiv_id:
+            # Old-style ids are tagged without the archive (see hal.get_eprint)
+            clauses.append(f"arxivId_s:*\\/{arxiv_id}")
+    new_ids = [arxiv_id for arxiv_id in arxiv_ids if "." in arxiv_id]
+    if new_ids:
+        clauses.append(f"arxivId_s:({' OR '.join(_quote(val) for val in new_ids)})")
+    return " OR ".join(clauses)
+
+
+def get_selected_pub_queries(group, ymin, chunk_size=50, tags=None):
+    """
+    Returns the arguments of the HAL queries for the selected publications
+    of the collection. The tags are read from the group file unless provided.
+    The tagged identifiers are split in chunks to keep the queries short
+    """
+    dois, arxiv_ids = get_tagged_ids(read_tagged_pub(group) if tags is None else tags)
+    ids = [("doi", doi) for doi in dois] + [("arxiv", val) for val in arxiv_ids]
+    queries = []
+    for idx in range(0, len(ids), chunk_size):
+        chunk = ids[idx : idx + chunk_size]
+        clause = get_ids_clause(
+            [val for kind, val in chunk if kind == "doi"],
+            [val for kind, val in chunk if kind == "arxiv"],
+        )
+        queries.append(
+            (f"collCode_s:{group} docType_s:ART ({clause})", PUB_FIELDS, ymin)
+        )
+    return queries
 
-    langs = {"en": 0, "fr": 1}
-    h1 = ["ALICE publications", "Publications d'ALICE"]
-    h2 = ["ALICE web page", "Page web d'ALICE"]
-    star = ["STAR publications on INSPIRE-HEP", "Publications de STAR sur INSPIRE-HEP"]
-    phenix = [
-        "PHENIX publications on INSPIRE-HEP",
-        "Publications de PHENIX sur INSPIRE-HEP",
-    ]
-    wa98 = [
-        "WA98 publications on INSPIRE-HEP",
-        "Publications de WA98 sur INSPIRE-HEP",
-    ]
-    selection = [
-        "Selection of publications and other standalone publications",
-        "Sélection des publications et autres publications",
-    ]
 
-    for key, idx in langs.items():
-        txt = formatter.header(h1[idx], 2)
-        txt += formatter.header(
-            formatter.link(
-                "http://aliceinfo.cern.ch/ArtSubmission/publications", h2[idx]
-            ),
+def merge_entries(results):
+    """Merges the results of several queries, removing the duplicates"""
+    merged = {}
+    for entries in results:
+        for entry in entries:
+            merged[int(entry["docid"])] = entry
+    return [merged[docid] for docid in sorted(merged)]
+
+
+def build_selected_pub(selected, ymin):
+    """Builds the document with the selected publications"""
+    doc = docModel.Document()
+    doc.append(
+        docModel.Header(
+            2,
+            docModel.Text({"en": "ALICE publications", "fr": "Publications d'ALICE"}),
+        )
+    )
+    doc.append(
+        docModel.Header(
             3,
+            docModel.Link(
+                "http://aliceinfo.cern.ch/ArtSubmission/publications",
+                docModel.Text({"en": "ALICE web page", "fr": "Page web d'ALICE"}),
+            ),
         )
-        txt += formatter.header(
-            formatter.link(
+    )
+    doc.append(
+        docModel.Header(
+            3,
+            docModel.Link(
                 "https://inspirehep.net/literature?sort=mostrecent&size=250&page=1&q=fin%20cn%20alice%20and%20a%20batigne%20and%20a%20germain%20and%20tc%20p%20not%20tc%20c",
-                "INSPIRE-HEP",
+                docModel.Text("INSPIRE-HEP"),
             ),
-            3,
         )
-        txt += formatter.header(
-            formatter.link(
+    )
+    doc.append(
+        docModel.Header(
+            2,
+            docModel.Link(
                 "https://inspirehep.net/literature?sort=mostrecent&size=25&page=1&q=fin%20cn%20star%20and%20%28a%20Erazmus%20or%20a%20kabana%29%20and%20tc%20p%20not%20tc%20c",
-                star[idx],
+                docModel.Text(
+                    {
+                        "en": "STAR publications on INSPIRE-HEP",
+                        "fr": "Publications de STAR sur INSPIRE-HEP",
+                    }
+                ),
             ),
-            2,
         )
-        txt += formatter.header(
-            formatter.link(
+    )
+    doc.append(
+        docModel.Header(
+            2,
+            docModel.Link(
                 "https://inspirehep.net/literature?sort=mostrecent&size=25&page=1&q=fin%20a%20Aphecetche%20and%20cn%20phenix%20and%20tc%20p%20not%20tc%20c",
-                phenix[idx],
+                docModel.Text(
+                    {
+                        "en": "PHENIX publications on INSPIRE-HEP",
+                        "fr": "Publications de PHENIX sur INSPIRE-HEP",
+                    }
+                ),
             ),
-            2,
         )
-        txt += formatter.header(
-            formatter.link(
+    )
+    doc.append(
+        docModel.Header(
+            2,
+            docModel.Link(
                 "https://inspirehep.net/literature?sort=mostrecent&size=25&page=1&q=fin%20a%20schutz%20and%20cn%20wa98%20and%20tc%20p%20not%20tc%20c",
-                wa98[idx],
+                docModel.Text(
+                    {
+                        "en": "WA98 publications on INSPIRE-HEP",
+                        "fr": "Publications de WA98 sur INSPIRE-HEP",
+                    }
+                ),
             ),
-            2,
         )
-        txt += formatter.header(
-            f"{selection[idx]} ({ymin}-{datetime.datetime.today().year})",
+    )
+    year = datetime.datetime.today().year
+    doc.append(
+        docModel.Header(
             2,
+            docModel.Text(
+                {
+                    "en": f"Selection of publications and other standalone publications ({ymin}-{year})",
+                    "fr": f"Sélection des publications et autres publications ({ymin}-{year})",
+                }
+            ),
         )
+    )
 
-        txt += formatter.list_start()
-        sel_for_sort = selected
-        for sel in selected:
-            if not sel.get("arxivId_s"):
-                sel["arxivId_s"] = "0"
-
-        for entry in sorted(
-            sel_for_sort,
-            key=lambda sel: (sel["producedDateY_i"], sel.get("arxivId_s")),
-            reverse=True,
-        ):
-            txt += formatter.list_item(
-                f"{entry['title_s'][0]}, {get_journal(entry, formatter)}"
+    pub_list = doc.append(docModel.List())
+    for sel in selected:
+        if not sel.get("arxivId_s"):
+            sel["arxivId_s"] = "0"
+
+    for entry in sorted(
+        selected,
+        key=lambda sel: (sel["producedDateY_i"], sel.get("arxivId_s")),
+        reverse=True,
+    ):
+        pub_list.append(
+            docModel.Item(
+                docModel.Text(f"{entry['title_s'][0]}, "), *get_journal(entry)
             )
-        txt += formatter.list_end()
+        )
+    return doc
+
+
+def generate_selected_pub(
+    group, fmts, ymin, subaweb_dir, entries=None, page_manifest=None
+):
+    """
+    Generates the list of selected publications in all languages
+    for each of the chosen output formats.
+    The HAL entries are queried unless they are provided.
+    The rendering is skipped if the manifest shows that the inputs did not change
+    """
+    if entries is None:
+        entries = merge_entries(
+            hal.get_parsed_many(get_selected_pub_queries(group, ymin), compact=True)
+        )
 
-        out_filename = get_out_filename(group, fmt, "publications", subaweb_dir, key)
-        dump_to_file(out_filename, "Publications", txt, fmt)
+    out_filenames = get_out_filenames(group, fmts, "publications", subaweb_dir)
+    input_fingerprint = get_fingerprint(
+        entries,
+        [get_tagged_pub_filename(group)],
+        ymin=ymin,
+        year=datetime.datetime.today().year,
+    )
+    if is_up_to_date(page_manifest, out_filenames, input_fingerprint):
+        return 0
+
+    selected = get_selected(entries, group)
+    document = build_selected_pub(selected, ymin)
+    titles = {"en": "Publications", "fr": "Publications"}
+    render_to_files(document, group, fmts, "publications", subaweb_dir, titles)
+    if page_manifest is not None:
+        page_manifest.update(out_filenames, input_fingerprint)
 
     return 0
 
 
+def get_theses_filename(group):
+    """Returns the file with the list of theses"""
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    return os.path.join(script_dir, f"groups/{group}/theses.yaml")
+
+
 def read_theses(group):
     """Read list of theses"""
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    filename = os.path.join(script_dir, f"groups/{group}/theses.yaml")
-    with open(filename, encoding="utf-8") as in_file:
-        in_entries = yaml.safe_load(in_file.read())
-        entries = []
-        for en in in_entries:
-            entry = {}
-            entry["title_s"] = [en["title"]]
-            entry["authFirstName_s"] = [en["firstname"]]
-            entry["authLastName_s"] = [en["lastname"]]
-            defense = en.get("defense")
-            if defense:
-                entry["defenseDate_s"] = defense
-            url = en.get("url")
-            if url:
-                entry["url"] = url
-            entries.append(entry)
-        return entries
-
-
-def generate_theses(group, fmt, subaweb_dir):
-    """Generate list of theses"""
-    entries = hal.get_parsed(
+    in_entries = loader.load_yaml(get_theses_filename(group))
+    entries = []
+    for en in in_entries:
+        entry = {}
+        entry["title_s"] = [en["title"]]
+        entry["authFirstName_s"] = [en["firstname"]]
+        entry["authLastName_s"] = [en["lastname"]]
+        defense = en.get("defense")
+        if defense:
+            entry["defenseDate_s"] = defense
+        url = en.get("url")
+        if url:
+            entry["url"] = url
+        entries.append(entry)
+    return entries
+
+
+def get_theses_query(group):
+    """Returns the arguments of the HAL query for the theses"""
+    return (
         f"collCode_s:{group} docType_s:THESE",
-        "halId_s,authFirstName_s,authLastName_s,title_s,defenseDate_s",
+        "halId_s,authFirstName_s,authLastName_s,title_s,defenseDate_s,collCode_s",
         2003,
     )
 
+
+def build_theses(ongoing, entries):
+    """Builds the document with the ongoing and defended theses"""
+    doc = docModel.Document()
+    if ongoing:
+        doc.append(
+            docModel.Header(2, docModel.Text({"en": "Ongoing", "fr": "En cours"}))
+        )
+        ongoing_list = doc.append(docModel.List())
+        for entry in ongoing:
+            ongoing_list.append(
+                docModel.Item(
+                    docModel.Text(
+                        f"{entry['title_s'][0]}, {entry['authFirstName_s'][0]} {entry['authLastName_s'][0].upper()}"
+                    )
+                )
+            )
+
+    doc.append(docModel.Header(2, docModel.Text({"en": "Defended", "fr": "Soutenues"})))
+
+    defended_list = doc.append(docModel.List())
+    for entry in sorted(entries, key=lambda sel: sel["defenseDate_s"], reverse=True):
+        url = entry.get("url")
+        if not url:
+            entry_id = entry.get("halId_s")
+            if entry_id:
+                url = "https://theses.hal.science/" + entry_id
+        title = docModel.Text(entry["title_s"][0])
+        if url:
+            title = docModel.Link(url, title)
+        defended_list.append(
+            docModel.Item(
+                title,
+                docModel.Text(
+                    f", {entry['authFirstName_s'][0]} {entry['authLastName_s'][0].upper()}, defended {entry['defenseDate_s']}"
+                ),
+            )
+        )
+    return doc
+
+
+def generate_theses(group, fmts, subaweb_dir, entries=None, page_manifest=None):
+    """
+    Generate list of theses in all languages for each of the chosen output formats.
+    The HAL entries are queried unless they are provided.
+    The rendering is skipped if the manifest shows that the inputs did not change
+    """
+    if entries is None:
+        entries = hal.get_parsed(*get_theses_query(group), compact=True)
+
+    out_filenames = get_out_filenames(group, fmts, "theses", subaweb_dir)
+    input_fingerprint = get_fingerprint(entries, [get_theses_filename(group)])
+    if is_up_to_date(page_manifest, out_filenames, input_fingerprint):
+        return 0
+
     local = read_theses(group)
     ongoing = [entry for entry in local if not "defenseDate_s" in entry]
     done = [entry for entry in local if "defenseDate_s" in entry]
 
     entries += done
 
-    formatter = get_formatter(fmt)
-
-    langs = {"en": 0, "fr": 1}
-    ong = ["Ongoing", "En cours"]
-    defended = ["Defended", "Soutenues"]
-    title = ["PhD", "Thèses"]
-
-    for key, idx in langs.items():
-        txt = ""
-        if ongoing:
-            txt += formatter.header(ong[idx], 2)
-            txt += formatter.list_start()
-            for entry in ongoing:
-                txt += formatter.list_item(
-                    f"{entry['title_s'][0]}, {entry['authFirstName_s'][0]} {entry['authLastName_s'][0].upper()}"
-                )
-            txt += formatter.list_end()
-
-        txt += formatter.header(defended[idx], 2)
-
-        txt += formatter.list_start()
-        for entry in sorted(
-            entries, key=lambda sel: sel["defenseDate_s"], reverse=True
-        ):
-            url = entry.get("url")
-            if not url:
-                entry_id = entry.get("halId_s")
-                if entry_id:
-                    url = "https://theses.hal.science/" + entry_id
-            title = entry["title_s"][0]
-            title_link = title
-            if url:
-                title_link = formatter.link(url, title)
-            txt += formatter.list_item(
-                f"{title_link}, {entry['authFirstName_s'][0]} {entry['authLastName_s'][0].upper()}, defended {entry['defenseDate_s']}"
-            )
-        txt += formatter.list_end()
-
-        out_filename = get_out_filename(group, fmt, "theses", subaweb_dir, key)
-        dump_to_file(out_filename, title[idx], txt, fmt)
+    document = build_theses(ongoing, entries)
+    titles = {"en": "PhD", "fr": "Thèses"}
+    render_to_files(document, group, fmts, "theses", subaweb_dir, titles)
+    if page_manifest is not None:
+        page_manifest.update(out_filenames, input_fingerprint)
 
     return 0
 
@@ -481,52 +721,54 @@ def generate_theses(group, fmt, subaweb_dir):
 # Conferences
 
 
-def format_contribution(conf, formatter):
-    """Generates the code for the contributions"""
+def format_contribution(conf):
+    """Builds the list of contributions"""
     if "contributions" not in conf:
-        return ""
+        return None
     contributions = conf["contributions"]
 
-    level = 2
-    out = formatter.list_start(level)
+    contrib_list = docModel.List(level=2)
     for contrib in contributions:
         fmt_contrib = ""
         if contrib.get("invited") and contrib["invited"] is True:
             fmt_contrib += "Invited "
         fmt_contrib += contrib["type"]
-        contrib_details = ""
+        nodes = [docModel.Text(fmt_contrib)]
+        contrib_details = []
         if contrib.get("title"):
-            contrib_details += formatter.text_it(contrib["title"]) + ","
+            contrib_details.append(docModel.Emph(docModel.Text(contrib["title"])))
+            contrib_details.append(docModel.Text(","))
         if contrib.get("firstname"):
-            contrib_details += (
-                " " + contrib["firstname"] + " " + contrib["lastname"].upper()
+            contrib_details.append(
+                docModel.Text(
+                    " " + contrib["firstname"] + " " + contrib["lastname"].upper()
+                )
             )
         if contrib.get("nauthors") and contrib["nauthors"] > 1:
-            contrib_details += " et al."
-        if len(contrib_details) > 0:
-            fmt_contrib += ": " + contrib_details
+            contrib_details.append(docModel.Text(" et al."))
+        if contrib_details:
+            nodes.append(docModel.Text(": "))
+            nodes += contrib_details
         if contrib.get("proceedings"):
-            fmt_contrib += ". Proceedings " + formatter.link(
-                contrib["proceedings"], "here"
-            )
-        out += formatter.list_item(fmt_contrib, level)
-    out += formatter.list_end(level)
-    return out
+            nodes.append(docModel.Text(". Proceedings "))
+            nodes.append(docModel.Link(contrib["proceedings"], docModel.Text("here")))
+        contrib_list.append(docModel.Item(*nodes))
+    return contrib_list
 
 
-def format_event(event, formatter):
-    """Generate the code for the event"""
-    out = ""
+def format_event(event):
+    """Builds the list item of the event"""
+    item = docModel.Item()
     url = event.get("url")
     name = event["conference"]
     if event.get("alias"):
         name = event["alias"]
     if url:
-        out += formatter.link(url, name)
+        item.append(docModel.Link(url, docModel.Text(name)))
     else:
-        out += name
+        item.append(docModel.Text(name))
 
-    out += (
+    out = (
         ", "
         + to_date(event["start"]).strftime("%d/%m/%y")
         + ", "
@@ -537,13 +779,43 @@ def format_event(event, formatter):
         out += " " + event["type"] + "."
     if event.get("participants"):
         out += " " + str(event["participants"]) + " participants."
-    out += format_contribution(event, formatter).rstrip()
-    return formatter.list_item(out)
-
+    item.append(docModel.Text(out))
+    contrib_list = format_contribution(event)
+    if contrib_list:
+        item.append(contrib_list)
+    return item
+
+
+def build_conferences(events_year):
+    """Builds the document with the events per year"""
+    doc = docModel.Document()
+    for year, merged_events in events_year.items():
+        doc.append(docModel.Header(2, docModel.Text(str(year))))
+        event_list = doc.append(docModel.List())
+        for event in merged_events:
+            event_list.append(format_event(event))
+    return doc
+
+
+def generate_conferences(group, fmts, subaweb_dir, entries=None, page_manifest=None):
+    """
+    Generate the conferences in all languages for each of the chosen output formats.
+    The HAL entries are queried unless they are provided.
+    The rendering is skipped if the manifest shows that the inputs did not change
+    """
+    if entries is None:
+        entries = hal.get_parsed(*confHandler.get_hal_query(group), compact=True)
+
+    out_filenames = get_out_filenames(group, fmts, "conferences", subaweb_dir)
+    input_fingerprint = get_fingerprint(
+        entries,
+        confHandler.get_input_filenames(group),
+        duplicate_threshold=confHandler.DUPLICATE_THRESHOLD,
+    )
+    if is_up_to_date(page_manifest, out_filenames, input_fingerprint):
+        return 0
 
-def generate_conferences(group, fmt, subaweb_dir):
-    """Generate the conferences"""
-    events = confHandler.get_events(group)
+    events = confHandler.get_events(group, entries)
     events_year = {}
     for evt in events:
         year = to_date(evt["start"]).year
@@ -551,29 +823,168 @@ def generate_conferences(group, fmt, subaweb_dir):
             events_year[year] = []
         events_year[year].append(evt)
 
-    formatter = get_formatter(fmt)
-    langs = {"en": 0, "fr": 1}
-    titles = ["Contribution to conferences", "Présentations à des Conférences"]
+    document = build_conferences(events_year)
+    last_year = max(events_year.keys())
+    titles = {
+        "en": f"Contribution to conferences (2008-{last_year})",
+        "fr": f"Présentations à des Conférences (2008-{last_year})",
+    }
+    render_to_files(document, group, fmts, "conferences", subaweb_dir, titles)
+    if page_manifest is not None:
+        page_manifest.update(out_filenames, input_fingerprint)
 
-    for key, idx in langs.items():
-        txt = ""
-        for year, merged_events in events_year.items():
-            txt += formatter.header(year, 2)
-            txt += formatter.list_start()
-            for event in merged_events:
-                txt += format_event(event, formatter)
-            txt += formatter.list_end()
+    return 0
 
-        last_year = max(events_year.keys())
-        title = f"{titles[idx]} (2008-{last_year})"
-        out_filename = get_out_filename(group, fmt, "conferences", subaweb_dir, key)
-        dump_to_file(out_filename, title, txt, fmt)
 
-    return 0
+# Groups
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Utility for bibliography")
+def get_required_filenames(group, fmts):
+    """Returns the local files needed to generate the pages of the group"""
+    filenames = [get_tagged_pub_filename(group)]
+    if "html" in fmts:
+        filenames.append(get_theses_filename(group))
+        filenames += confHandler.get_input_filenames(group)
+    return filenames
+
+
+def get_local_groups(fmts):
+    """
+    Returns the groups with local information in the groups directory.
+    The groups with missing local files are reported and skipped
+    """
+    script_dir = os.path.dirname(os.path.realpath(__file__))
+    groups_dir = os.path.join(script_dir, "groups")
+    groups = []
+    for name in sorted(os.listdir(groups_dir)):
+        if not os.path.isdir(os.path.join(groups_dir, name)):
+            continue
+        missing = [
+            filename
+            for filename in get_required_filenames(name, fmts)
+            if not os.path.exists(filename)
+        ]
+        if missing:
+            print(f"Skip group {name}, missing files: " + ", ".join(missing))
+            continue
+        groups.append(name)
+    return groups
+
+
+def get_queries(group, fmts, ymin):
+    """Returns the arguments of the HAL queries needed to generate each page"""
+    queries = {"publications": get_selected_pub_queries(group, ymin)}
+    if "html" in fmts:
+        queries["theses"] = [get_theses_query(group)]
+        queries["conferences"] = [confHandler.get_hal_query(group)]
+    return queries
+
+
+def run_queries(queries):
+    """Runs all the queries concurrently and returns the merged entries of each page"""
+    flat = [query for page_queries in queries.values() for query in page_queries]
+    with profiler.stage("HAL queries") as info:
+        info["records"] = len(flat)
+        flat_results = iter(hal.get_parsed_many(flat, compact=True))
+    results = {}
+    for name, page_queries in queries.items():
+        page_results = [next(flat_results) for _ in page_queries]
+        if len(page_results) == 1:
+            results[name] = page_results[0]
+        else:
+            results[name] = merge_entries(page_results)
+    return results
+
+
+def split_by_group(entries, groups):
+    """Splits the entries per group according to their collection codes"""
+    split: dict = {group: [] for group in groups}
+    for entry in entries:
+        for collection in entry.get("collCode_s", []):
+            if collection in split:
+                split[collection].append(entry)
+    return split
+
+
+def generate_group(group, fmts, ymin, subaweb_dir, results, manifest_args):
+    """
+    Generates the pages of the group from the entries of each page (see run_queries).
+    manifest_args are the arguments of the manifest, or None to always generate.
+    Returns the return code and the updated entries of the manifest
+    """
+    g_manifest = manifest.Manifest(*manifest_args) if manifest_args else None
+    ret_code = 0
+    with profiler.stage(f"{group} publications"):
+        ret_code += generate_selected_pub(
+            group, fmts, ymin, subaweb_dir, results["publications"], g_manifest
+        )
+    if "html" in fmts:
+        with profiler.stage(f"{group} theses"):
+            ret_code += generate_theses(
+                group, ["html"], subaweb_dir, results["theses"], g_manifest
+            )
+        with profiler.stage(f"{group} conferences"):
+            ret_code += generate_conferences(
+                group, ["html"], subaweb_dir, results["conferences"], g_manifest
+            )
+    return ret_code, g_manifest.updated if g_manifest else {}
+
+
+def generate_all_groups(fmts, ymin, subaweb_dir, manifest_args, jobs=None):
+    """
+    Generates the pages of all the groups with local information.
+    Each document type is queried once for the whole SUBATECH collection,
+    the publications being restricted to the ones selected by any group.
+    The entries are split by group and the pages of the groups
+    are generated in parallel
+    """
+    # pylint: disable-next=import-outside-toplevel
+    import concurrent.futures
+
+    groups = get_local_groups(fmts)
+    # Only the publications selected by any of the groups are queried
+    all_tags: dict = {}
+    for group in groups:
+        all_tags.update(read_tagged_pub(group))
+    queries = {
+        "publications": get_selected_pub_queries("SUBATECH", ymin, tags=all_tags)
+    }
+    if "html" in fmts:
+        queries["theses"] = [get_theses_query("SUBATECH")]
+        queries["conferences"] = [confHandler.get_hal_query("SUBATECH")]
+    split = {
+        name: split_by_group(entries, groups)
+        for name, entries in run_queries(queries).items()
+    }
+
+    ret_code = 0
+    updated: dict = {}
+    # The stages of the worker processes are not recorded by the profiler
+    with profiler.stage("Generate groups") as info:
+        info["records"] = len(groups)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    generate_group,
+                    group,
+                    fmts,
+                    ymin,
+                    subaweb_dir,
+                    {name: entries[group] for name, entries in split.items()},
+                    manifest_args,
+                )
+                for group in groups
+            ]
+            for future in futures:
+                group_ret_code, group_updated = future.result()
+                ret_code += group_ret_code
+                updated.update(group_updated)
+    return ret_code, updated
+
+
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    parser = argparse.ArgumentParser(prog=prog, description="Utility for bibliography")
     parser.add_argument("--group", help="Subatech group", default="SUBATECH-PLASMA")
     parser.add_argument("--ymin", help="Minimum year", type=int, default=2007)
     parser.add_argument(
@@ -584,13 +995,65 @@ if __name__ == "__main__":
         default=".",
     )
     parser.add_argument(
-        "--format", help="Output format", choices=["html", "mdx"], default="mdx"
+        "--format",
+        help="Output formats",
+        choices=["html", "mdx"],
+        nargs="+",
+        default=["mdx"],
+    )
+    parser.add_argument(
+        "--manifest",
+        help="File with the fingerprints of the inputs of the generated files",
+        default=manifest.DEFAULT_FILENAME,
     )
+    parser.add_argument(
+        "--force",
+        help="Generate the files even if their inputs did not change",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--all-groups",
+        help="Generate the pages of all the groups in the groups directory",
+        dest="all_groups",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        help="Number of groups generated in parallel with --all-groups",
+        type=int,
+    )
+    hal.add_arguments(parser)
+    profiler.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    hal.configure(args)
+    profiler.configure(args)
+    manifest_args = (args.manifest, args.force)
+    if args.all_groups:
+        ret_code, updated = generate_all_groups(
+            args.format, args.ymin, args.subaweb, manifest_args, args.jobs
+        )
+    else:
+        # Run the independent HAL queries concurrently
+        queries = get_queries(args.group, args.format, args.ymin)
+        results = run_queries(queries)
+        ret_code, updated = generate_group(
+            args.group,
+            args.format,
+            args.ymin,
+            args.subaweb,
+            results,
+            manifest_args,
+        )
 
-    args = parser.parse_args()
-    ret_code = 0
-    ret_code += generate_selected_pub(args.group, args.format, args.ymin, args.subaweb)
-    if args.format == "html":
-        ret_code += generate_theses(args.group, args.format, args.subaweb)
-        ret_code += generate_conferences(args.group, args.format, args.subaweb)
-    sys.exit(ret_code)
+    # Merge the manifest updates of all groups
+    out_manifest = manifest.Manifest(args.manifest)
+    out_manifest.merge(updated)
+    out_manifest.save()
+    profiler.report()
+    return ret_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,33 +2,396 @@
 
 """Utilities to query the HAL webpage"""
 
-import urllib.request
+import sys
 import urllib.parse
 import json
+import threading
+import collections.abc
+import cache
+import profiler
+import snapshot
+import webClient
 
+SEARCH_URL = "https://api.archives-ouvertes.fr/search/index/"
 
-def _make_query(query_string, out_fields, ymin, ymax, size):
+# Default time-to-live of the cached query results (in seconds)
+DEFAULT_TTL = 24 * 3600
+
+_CACHE = cache.DiskCache("hal")
+_CONFIG = {"mirror": None}
+
+# Bounds the number of concurrent asynchronous queries without their own semaphore
+_QUERY_SLOTS = threading.BoundedSemaphore(webClient.DEFAULT_MAX_CONNECTIONS)
+
+
+def add_arguments(parser):
+    """Adds the command line options related to the HAL queries"""
+    parser.add_argument(
+        "--no-cache",
+        help="Do not use the cache of the HAL and INSPIRE-HEP queries",
+        dest="use_cache",
+        action="store_false",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        help="Query HAL and INSPIRE-HEP again and refresh the cached results",
+        dest="refresh_cache",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--timeout",
+        help="Timeout of the web requests in seconds",
+        type=float,
+        default=webClient.DEFAULT_TIMEOUT,
+    )
+    parser.add_argument(
+        "--mirror",
+        help="Query the local SQLite mirror of HAL instead of the HAL website",
+    )
+    parser.add_argument(
+        "--snapshot",
+        help="Serve the web requests from the snapshot file, without network access",
+    )
+
+
+def configure(args):
+    """Configures the HAL queries from the parsed command line options"""
+    webClient.get_client().timeout = args.timeout
+    if args.snapshot:
+        snapshot.load(args.snapshot)
+    # The responses must go through the web client to be recorded or replayed
+    cache.SETTINGS["use_cache"] = args.use_cache and not snapshot.is_enabled()
+    cache.SETTINGS["refresh"] = args.refresh_cache
+    _CONFIG["mirror"] = None if snapshot.is_enabled() else args.mirror
+
+
+def _year_filter(ymin, ymax):
+    return f"producedDateY_i:[{ymin} TO {ymax}]"
+
+
+def _make_query(query_string, out_fields, filter_query, size, cursor="*"):
     query = {
         "omitHeader": "true",
         "wt": "json",
         "q": query_string,
         "rows": size,
         "fl": out_fields,
-        "fq": f"producedDateY_i:[{ymin} TO {ymax}]",
+        # Cursor pagination requires a sort on the unique key
+        "sort": "docid asc",
+        "cursorMark": cursor,
     }
-    return urllib.parse.urlencode(query)
+    if filter_query:
+        query["fq"] = filter_query
+    return query
 
 
-def get_parsed(query_string, out_fields, ymin, ymax=2100, size=9000):
-    """Query HAL website and returns a parsed dictionary"""
-    query = _make_query(query_string, out_fields, ymin, ymax, size)
-    url = "https://api.archives-ouvertes.fr/search/index/"
-    print("Query: " + url + "?" + query)
-    with urllib.request.urlopen(url, query.encode(), timeout=100) as response:
-        parsed = json.loads(response.read().decode("utf-8"))
+def _get_page(query_string, out_fields, filter_query, size, cursor):
+    """Query one page of results and returns the parsed dictionary"""
+    query = _make_query(query_string, out_fields, filter_query, size, cursor)
+    print("Query: " + SEARCH_URL + "?" + urllib.parse.urlencode(query))
+    response = webClient.get_client().post(SEARCH_URL, query)
+    return json.loads(response.decode("utf-8"))
+
+
+def _cache_key(query_string, out_fields, filter_query, size):
+    """Returns the normalized query used as cache key"""
+    key = {
+        "q": " ".join(query_string.split()),
+        "fl": ",".join(sorted(field.strip() for field in out_fields.split(","))),
+        "fq": filter_query,
+        "rows": size,
+    }
+    return json.dumps(key, sort_keys=True)
+
+
+def iter_search(query_string, out_fields, filter_query, page_size=1000):
+    """
+    Query HAL website and yields the parsed entries, page by page.
+    The results are not cached
+    """
+    cursor = "*"
+    n_entries = 0
+    while True:
+        parsed = _get_page(query_string, out_fields, filter_query, page_size, cursor)
         entries = parsed["response"]["docs"]
-        print(f"Entries found {len(entries)} (max set: {size})")
-        return entries
+        n_entries += len(entries)
+        yield from entries
+        next_cursor = parsed.get("nextCursorMark")
+        if not entries or not next_cursor or next_cursor == cursor:
+            break
+        cursor = next_cursor
+    print(f"Entries found {n_entries} (page size: {page_size})")
+
+
+# Field layouts shared by the records with the same fields
+_LAYOUTS: dict = {}
+
+
+def _get_layout(fields):
+    """Returns the shared layout: the field names and their positions"""
+    fields = tuple(sys.intern(field) for field in fields)
+    layout = _LAYOUTS.get(fields)
+    if layout is None:
+        layout = _LAYOUTS.setdefault(
+            fields, (fields, {field: pos for pos, field in enumerate(fields)})
+        )
+    return layout
+
+
+def _compact(value):
+    """Returns the value with interned strings and tuples instead of lists"""
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(_compact(val) for val in value)
+    return value
+
+
+class HalRecord(collections.abc.Mapping):
+    """
+    Compact HAL entry.
+    The field names are shared by all the records with the same fields,
+    and the strings are interned, so that the author names and structures
+    repeated in many entries are stored once.
+    The record behaves as a dictionary, except that the multi-valued fields
+    are tuples. The facet fields (_fs) are kept as the raw HAL strings
+    """
+
+    __slots__ = ("_layout", "_values")
+
+    def __init__(self, entry):
+        self._layout = _get_layout(entry.keys())
+        self._values = tuple(_compact(value) for value in entry.values())
+
+    def __getitem__(self, key):
+        return self._values[self._layout[1][key]]
+
+    def __iter__(self):
+        return iter(self._layout[0])
+
+    def __len__(self):
+        return len(self._values)
+
+    def __setitem__(self, key, value):
+        fields, positions = self._layout
+        value = _compact(value)
+        if key in positions:
+            values = list(self._values)
+            values[positions[key]] = value
+            self._values = tuple(values)
+        else:
+            self._layout = _get_layout(fields + (key,))
+            self._values += (value,)
+
+    def __reduce__(self):
+        return (HalRecord, (dict(self),))
+
+    def __repr__(self):
+        return f"HalRecord({dict(self)!r})"
+
+
+def _iter_entries(query_string, out_fields, ymin, ymax, page_size, ttl):
+    if _CONFIG["mirror"]:
+        # pylint: disable-next=import-outside-toplevel
+        import halMirror
+
+        yield from halMirror.query(
+            _CONFIG["mirror"], query_string, out_fields, ymin, ymax
+        )
+        return
+    filter_query = _year_filter(ymin, ymax)
+    if not cache.SETTINGS["use_cache"]:
+        yield from iter_search(query_string, out_fields, filter_query, page_size)
+        return
+    key = _cache_key(query_string, out_fields, filter_query, page_size)
+    if not cache.SETTINGS["refresh"]:
+        cached = _CACHE.read(key, ttl)
+        if cached is not None:
+            print(f"Cached query: {query_string} ({ymin}-{ymax})")
+            yield from cached
+            return
+    with _CACHE.writer(key) as write:
+        for entry in iter_search(query_string, out_fields, filter_query, page_size):
+            write(entry)
+            yield entry
+
+
+def iter_parsed(
+    query_string,
+    out_fields,
+    ymin,
+    ymax=2100,
+    page_size=1000,
+    ttl=DEFAULT_TTL,
+    compact=False,
+):
+    """
+    Query HAL website and yields the parsed entries.
+    The results are retrieved page by page with the Solr cursorMark,
+    so that only one page at a time is kept in memory.
+    The results are cached on disk for ttl seconds.
+    If a local mirror is configured, it is queried instead.
+    If compact is set, the entries are yielded as HalRecord
+    """
+    entries = _iter_entries(query_string, out_fields, ymin, ymax, page_size, ttl)
+    if compact:
+        entries = map(HalRecord, entries)
+    yield from entries
+
+
+def get_parsed(
+    query_string,
+    out_fields,
+    ymin,
+    ymax=2100,
+    page_size=1000,
+    ttl=DEFAULT_TTL,
+    compact=False,
+):
+    """Query HAL website and returns the list of parsed entries"""
+    with profiler.stage(f"HAL query {query_string} ({ymin}-{ymax})") as info:
+        entries = list(
+            iter_parsed(query_string, out_fields, ymin, ymax, page_size, ttl, compact)
+        )
+        info["records"] = len(entries)
+    return entries
+
+
+def _make_facet_query(query_string, facet_fields, filter_query):
+    query = {
+        "omitHeader": "true",
+        "wt": "json",
+        "q": query_string,
+        "rows": 0,
+        "fq": filter_query,
+        "facet": "true",
+        "facet.limit": -1,
+        "facet.mincount": 1,
+    }
+    if len(facet_fields) == 1:
+        query["facet.field"] = facet_fields[0]
+    else:
+        query["facet.pivot"] = ",".join(facet_fields)
+    return query
+
+
+def _pivot_to_dict(pivots, depth):
+    counts = {}
+    for pivot in pivots:
+        if depth > 1:
+            counts[pivot["value"]] = _pivot_to_dict(pivot.get("pivot", []), depth - 1)
+        else:
+            counts[pivot["value"]] = pivot["count"]
+    return counts
+
+
+def _parse_facets(parsed, facet_fields):
+    facets = parsed["facet_counts"]
+    if len(facet_fields) == 1:
+        flat = facets["facet_fields"][facet_fields[0]]
+        return dict(zip(flat[::2], flat[1::2]))
+    pivots = facets["facet_pivot"][",".join(facet_fields)]
+    return _pivot_to_dict(pivots, len(facet_fields))
+
+
+def _count_facets(entries, facet_fields):
+    """Computes the nested facet counts from the entries"""
+    counts: dict = {}
+    for entry in entries:
+        levels = [counts]
+        for idx, field in enumerate(facet_fields):
+            vals = entry.get(field)
+            if vals is None:
+                levels = []
+                break
+            if not isinstance(vals, list):
+                vals = [vals]
+            last = idx == len(facet_fields) - 1
+            next_levels = []
+            for level in levels:
+                for val in vals:
+                    if last:
+                        level[val] = level.get(val, 0) + 1
+                    else:
+                        next_levels.append(level.setdefault(val, {}))
+            levels = next_levels
+    return counts
+
+
+def get_facets(query_string, facet_fields, ymin, ymax=2100, ttl=DEFAULT_TTL):
+    """
+    Query HAL website and returns the number of entries per value of the facet fields.
+    With several fields, the counts are nested dictionaries
+    (e.g. counts[doc_type][year] for the fields docType_s and producedDateY_i)
+    """
+    with profiler.stage(f"HAL facets {query_string} ({ymin}-{ymax})"):
+        return _query_facets(query_string, facet_fields, ymin, ymax, ttl)
+
+
+def _query_facets(query_string, facet_fields, ymin, ymax, ttl):
+    if _CONFIG["mirror"]:
+        # pylint: disable-next=import-outside-toplevel
+        import halMirror
+
+        entries = halMirror.query(
+            _CONFIG["mirror"], query_string, ",".join(facet_fields), ymin, ymax
+        )
+        return _count_facets(entries, facet_fields)
+    filter_query = _year_filter(ymin, ymax)
+    query = _make_facet_query(query_string, facet_fields, filter_query)
+    key = json.dumps({"facet": query}, sort_keys=True)
+    if cache.SETTINGS["use_cache"] and not cache.SETTINGS["refresh"]:
+        cached = _CACHE.read(key, ttl)
+        if cached is not None:
+            print(f"Cached facet query: {query_string} ({ymin}-{ymax})")
+            return _parse_facets(next(cached), facet_fields)
+    print("Query: " + SEARCH_URL + "?" + urllib.parse.urlencode(query))
+    response = webClient.get_client().post(SEARCH_URL, query)
+    parsed = json.loads(response.decode("utf-8"))
+    if cache.SETTINGS["use_cache"]:
+        _CACHE.store(key, [parsed])
+    return _parse_facets(parsed, facet_fields)
+
+
+def _get_parsed_bounded(*args, **kwargs):
+    with _QUERY_SLOTS:
+        return get_parsed(*args, **kwargs)
+
+
+async def get_parsed_async(*args, semaphore=None, **kwargs):
+    """
+    Asynchronous version of get_parsed.
+    The blocking query runs in a worker thread.
+    The semaphore bounds the number of concurrent queries: without semaphore,
+    the queries share as many slots as the connections of the web client
+    """
+    # pylint: disable-next=import-outside-toplevel
+    import asyncio
+
+    if semaphore is None:
+        return await asyncio.to_thread(_get_parsed_bounded, *args, **kwargs)
+    async with semaphore:
+        return await asyncio.to_thread(get_parsed, *args, **kwargs)
+
+
+def get_parsed_many(queries, max_concurrency=4, compact=False):
+    """
+    Runs the queries concurrently and returns the list of results in the same order.
+    Each query is a tuple with the positional arguments of get_parsed
+    """
+    # pylint: disable-next=import-outside-toplevel
+    import asyncio
+
+    async def _run():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        return await asyncio.gather(
+            *(
+                get_parsed_async(*query, semaphore=semaphore, compact=compact)
+                for query in queries
+            )
+        )
+
+    return asyncio.run(_run())
 
 
 def get_eprint(arxiv):
@@ -38,3 +401,28 @@ def get_eprint(arxiv):
     if "/" in arxiv:
         return arxiv.split("/")[1]
     return arxiv
+
+
+def main(argv=None):
+    """Command line interface: returns the return code"""
+    # pylint: disable-next=import-outside-toplevel
+    import argparse
+
+    # pylint: disable-next=import-outside-toplevel
+    import halMirror
+
+    parser = argparse.ArgumentParser(description="Utilities to query HAL")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    # The options of the command are parsed by halMirror
+    subparsers.add_parser(
+        "sync",
+        help="Synchronize the local mirror of the SUBATECH documents",
+        add_help=False,
+    )
+
+    _, command_args = parser.parse_known_args(argv)
+    return halMirror.main(command_args, prog="hal.py sync")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+
+"""Local SQLite mirror of the SUBATECH documents in HAL"""
+
+import os
+import re
+import json
+import sqlite3
+import datetime
+import contextlib
+import hal
+
+# Documents kept in the mirror
+MIRROR_QUERY = "collCode_s:SUBATECH OR structure_t:SUBATECH"
+
+# Union of the fields used by the scripts
+MIRROR_FIELDS = [
+    "docid",
+    "halId_s",
+    "modifiedDate_tdate",
+    "producedDateY_i",
+    "docType_s",
+    "collCode_s",
+    "structName_s",
+    "structAcronym_s",
+    "title_s",
+    "authFullName_s",
+    "authFirstName_s",
+    "authLastName_s",
+    "authIdHasPrimaryStructure_fs",
+    "collaboration_s",
+    "arxivId_s",
+    "doiId_s",
+    "journalTitle_s",
+    "volume_s",
+    "number_s",
+    "page_s",
+    "defenseDate_s",
+    "conferenceStartDate_s",
+    "conferenceEndDate_s",
+    "conferenceTitle_s",
+    "city_s",
+    "country_s",
+    "publisherLink_s",
+    "audience_s",
+    "invitedCommunication_s",
+]
+
+# Text fields are not stored by HAL: search the corresponding stored fields
+_TEXT_FIELDS = {"structure_t": ("structName_s", "structAcronym_s")}
+
+_TOKEN_RE = re.compile(r'\s*(\(|\)|"(?:[^"\\]|\\.)*"|[^\s()"]+)')
+
+
+def _connect(filename):
+    """Opens the mirror for the synchronization, creating the tables if needed"""
+    conn = sqlite3.connect(filename)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS documents "
+        "(docid INTEGER PRIMARY KEY, year INTEGER, modified TEXT, data TEXT)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS documents_year ON documents (year)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS sync_info (key TEXT PRIMARY KEY, value TEXT)"
+    )
+    return conn
+
+
+def _connect_read_only(filename):
+    """
+    Opens the synchronized mirror for reading.
+    Raises FileNotFoundError if the file does not exist,
+    and ValueError if the mirror was never synchronized
+    """
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(
+            f"HAL mirror {filename} not found: create it with hal.py sync"
+        )
+    conn = sqlite3.connect(f"file:{filename}?mode=ro", uri=True)
+    try:
+        last_sync = _get_info(conn, "last_sync")
+    except sqlite3.DatabaseError:
+        last_sync = None
+    if not last_sync:
+        conn.close()
+        raise ValueError(
+            f"HAL mirror {filename} was never synchronized: run hal.py sync"
+        )
+    return conn
+
+
+def _get_info(conn, key):
+    row = conn.execute("SELECT value FROM sync_info WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def _set_info(conn, key, value):
+    conn.execute(
+        "INSERT OR REPLACE INTO sync_info (key, value) VALUES (?, ?)", (key, value)
+    )
+
+
+def sync(filename, full=False):
+    """
+    Synchronizes the mirror with HAL.
+    After the first full load, only the documents modified since the last
+    synchronization are downloaded. The documents that are no more in HAL
+    are removed from the mirror
+    """
+    with contextlib.closing(_connect(filename)) as conn:
+        fields = ",".join(MIRROR_FIELDS)
+        last_sync = None
+        if not full and _get_info(conn, "fields") == fields:
+            last_sync = _get_info(conn, "last_sync")
+        sync_start = datetime.datetime.now(datetime.UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+        filter_query = None
+        if last_sync:
+            print("Synchronize documents modified since " + last_sync)
+            filter_query = f"modifiedDate_tdate:[{last_sync} TO *]"
+        n_updated = 0
+        for entry in hal.iter_search(MIRROR_QUERY, fields, filter_query):
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (docid, year, modified, data) "
+                "VALUES (?, ?, ?, ?)",
+                (
+                    int(entry["docid"]),
+                    entry.get("producedDateY_i"),
+                    entry.get("modifiedDate_tdate"),
+                    json.dumps(entry, ensure_ascii=False),
+                ),
+            )
+            n_updated += 1
+
+        # Deleted documents do not show up in the modified ones:
+        # compare the full list of identifiers
+        remote_ids = {
+            int(entry["docid"])
+            for entry in hal.iter_search(MIRROR_QUERY, "docid", None, 10000)
+        }
+        local_ids = {row[0] for row in conn.execute("SELECT docid FROM documents")}
+        deleted = local_ids - remote_ids
+        conn.executemany(
+            "DELETE FROM documents WHERE docid = ?", [(docid,) for docid in deleted]
+        )
+        _set_info(conn, "last_sync", sync_start)
+        _set_info(conn, "fields", fields)
+        conn.commit()
+        print(f"Mirror {filename}: {n_updated} updated, {len(deleted)} deleted")
+    return 0
+
+
+def _tokenize(query_string):
+    return _TOKEN_RE.findall(query_string)
+
+
+def _unquote(value):
+    if value.startswith('"'):
+        value = value[1:-1]
+    return value.replace("\\", "")
+
+
+def _as_list(vals):
+    return vals if isinstance(vals, list) else [vals]
+
+
+def _match_value(entry, field, value):
+    """Checks if the field of the entry matches the value"""
+    text_field = _TEXT_FIELDS.get(field)
+    if text_field:
+        vals = [
+            val
+            for stored_field in text_field
+            for val in _as_list(entry.get(stored_field, []))
+        ]
+        if not vals:
+            return False
+        if value == "*":
+            return True
+        regex = re.compile(r"\b{}\b".format(re.escape(value)), re.IGNORECASE)
+        return any(regex.search(str(val)) for val in vals)
+    vals = entry.get(field)
+    if vals is None:
+        return False
+    if value == "*":
+        return True
+    vals = _as_list(vals)
+    if value.endswith("*"):
+        return any(str(val).startswith(value[:-1]) for val in vals)
+    if value.startswith("*"):
+        return any(str(val).endswith(value[1:]) for val in vals)
+    return any(str(val) == value for val in vals)
+
+
+class _QueryParser:
+    """
+    Minimal parser of the Solr query syntax used by the scripts:
+    field:value terms, AND, OR, NOT, parentheses and field:(...) groups.
+    As in HAL, the terms without operator are combined with AND
+    """
+
+    def __init__(self, query_string):
+        self.tokens = _tokenize(query_string)
+        self.pos = 0
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        """Returns a function checking if the entry matches the query"""
+        pred = self._parse_or(None)
+        if self._peek() is not None:
+            raise ValueError(f"Unexpected token in query: {self._peek()}")
+        return pred
+
+    def _parse_or(self, field):
+        preds = [self._parse_and(field)]
+        while self._peek() == "OR":
+            self._next()
+            preds.append(self._parse_and(field))
+        if len(preds) == 1:
+            return preds[0]
+        return lambda entry: any(pred(entry) for pred in preds)
+
+    def _parse_and(self, field):
+        preds = [self._parse_unary(field)]
+        while self._peek() not in (None, ")", "OR"):
+            if self._peek() == "AND":
+                self._next()
+            preds.append(self._parse_unary(field))
+        if len(preds) == 1:
+            return preds[0]
+        return lambda entry: all(pred(entry) for pred in preds)
+
+    def _parse_unary(self, field):
+        token = self._next()
+        if token is None:
+            raise ValueError("Unexpected end of query")
+        if token == "NOT":
+            pred = self._parse_unary(field)
+            return lambda entry: not pred(entry)
+        if token == "(":
+            pred = self._parse_or(field)
+            if self._next() != ")":
+                raise ValueError("Unbalanced parenthesis in query")
+            return pred
+        if not token.startswith('"') and ":" in token:
+            field, value = token.split(":", 1)
+            if not value:
+                # Value in the next token: quoted string or group
+                return self._parse_unary(field)
+        else:
+            value = token
+        if field is None:
+            raise ValueError(f"Missing field for {token} in query")
+        value = _unquote(value)
+        return lambda entry: _match_value(entry, field, value)
+
+
+def query(filename, query_string, out_fields, ymin, ymax=2100):
+    """Query the mirror and yields the entries with the requested fields"""
+    matches = _QueryParser(query_string).parse()
+    fields = [field.strip() for field in out_fields.split(",")]
+    missing = [field for field in fields if field not in MIRROR_FIELDS]
+    if missing:
+        print("Caveat: fields not in the mirror: " + ",".join(missing))
+    print(f"Mirror query: {query_string} ({ymin}-{ymax})")
+    with contextlib.closing(_connect_read_only(filename)) as conn:
+        rows = conn.execute(
+            "SELECT data FROM documents WHERE year BETWEEN ? AND ? ORDER BY docid",
+            (ymin, ymax),
+        )
+        for (data,) in rows:
+            entry = json.loads(data)
+            if matches(entry):
+                yield {field: entry[field] for field in fields if field in entry}
+
+
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    # pylint: disable-next=import-outside-toplevel
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Synchronize the local mirror of the SUBATECH documents"
+    )
+    parser.add_argument(
+        "--mirror", help="SQLite mirror file", default="hal_mirror.sqlite"
+    )
+    parser.add_argument(
+        "--full", help="Download again all documents", action="store_true"
+    )
+
+    args = parser.parse_args(argv)
+    return sync(args.mirror, args.full)
+
+
+if __name__ == "__main__":
+    import sys
+
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+
+"""Utilities to query the INSPIRE-HEP literature"""
+
+import json
+import time
+import threading
+import urllib.error
+import concurrent.futures
+import cache
+import profiler
+import webClient
+
+SEARCH_URL = "https://inspirehep.net/api/literature"
+
+# INSPIRE-HEP allows 15 requests every 5 seconds
+RATE_LIMIT = (15, 5.0)
+
+
+class _RateLimiter:
+    """Blocks until a request is allowed by the rate limit (thread safe)"""
+
+    def __init__(self, n_requests, period):
+        self.n_requests = n_requests
+        self.period = period
+        self._times: list = []
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Waits until a new request is allowed"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._times = [tt for tt in self._times if now - tt < self.period]
+                if len(self._times) < self.n_requests:
+                    self._times.append(now)
+                    return
+                delay = self.period - (now - self._times[0])
+            time.sleep(delay)
+
+
+_LIMITER = _RateLimiter(*RATE_LIMIT)
+
+# Time-to-live of the cached answers (in seconds).
+# The collaboration of a published paper never changes,
+# but a paper without collaboration or not found might be updated in INSPIRE-HEP
+NO_COLLABORATION_TTL = 180 * 24 * 3600
+NOT_FOUND_TTL = 30 * 24 * 3600
+
+_CACHE = cache.KeyValueCache("inspire")
+
+
+def _get_ttl(answer):
+    """Returns the time-to-live of the cached answer"""
+    if answer["status"] == "not_found":
+        return NOT_FOUND_TTL
+    if answer["collaboration"] is None:
+        return NO_COLLABORATION_TTL
+    return None
+
+
+def get_key(kind, value):
+    """Returns the key identifying a DOI (kind="doi") or arXiv id (kind="arxiv")"""
+    if kind == "doi":
+        # DOIs are case insensitive
+        value = value.lower()
+    return f"{kind}:{value}"
+
+
+def _get(params, max_retries=3):
+    """Performs one request respecting the rate limit"""
+    for attempt in range(max_retries + 1):
+        _LIMITER.wait()
+        try:
+            return json.loads(webClient.get_client().get(SEARCH_URL, params))
+        except urllib.error.HTTPError as err:
+            if err.code != 429 or attempt == max_retries:
+                raise
+            retry_after = err.headers.get("Retry-After") if err.headers else None
+            time.sleep(float(retry_after) if retry_after else RATE_LIMIT[1])
+    return None
+
+
+def _search(query, size):
+    """Yields the metadata of all the records matching the query"""
+    page = 1
+    n_hits = 0
+    while True:
+        parsed = _get(
+            {
+                "q": query,
+                "size": size,
+                "page": page,
+                "fields": "dois.value,arxiv_eprints.value,collaborations.value",
+            }
+        )
+        hits = parsed["hits"]["hits"]
+        for hit in hits:
+            yield hit["metadata"]
+        n_hits += len(hits)
+        if not hits or n_hits >= parsed["hits"]["total"]:
+            break
+        page += 1
+
+
+def _lookup_batch(batch, size):
+    """Returns the collaborations of the records matching the (kind, value) pairs"""
+    query = " or ".join(f'{kind} "{value}"' for kind, value in batch)
+    print(f"Query INSPIRE-HEP for {len(batch)} identifiers")
+    collabs = {}
+    for meta in _search(query, size):
+        collab = meta.get("collaborations")
+        value = collab[0]["value"] if collab else None
+        for doi in meta.get("dois", []):
+            collabs[get_key("doi", doi["value"])] = value
+        for arxiv in meta.get("arxiv_eprints", []):
+            collabs[get_key("arxiv", arxiv["value"])] = value
+    return collabs
+
+
+def get_collaborations(identifiers, batch_size=50, max_workers=4):
+    """
+    Search the records with the (kind, value) identifiers,
+    where kind is "doi" or "arxiv", in a few batched requests.
+    Returns a dictionary with the key of each identifier found (see get_key)
+    and the first collaboration of the record, or None if there is none.
+    The identifiers that are not found are not in the dictionary.
+    The answers, including the negative ones, are cached on disk
+    """
+    identifiers = list(dict.fromkeys(identifiers))
+    collabs: dict = {}
+    if cache.SETTINGS["use_cache"] and not cache.SETTINGS["refresh"]:
+        to_query = []
+        for kind, value in identifiers:
+            key = get_key(kind, value)
+            answer = _CACHE.get(key, _get_ttl)
+            if answer is None:
+                to_query.append((kind, value))
+            elif answer["status"] == "found":
+                collabs[key] = answer["collaboration"]
+        n_cached = len(identifiers) - len(to_query)
+        print(f"INSPIRE-HEP answers cached for {n_cached} identifiers")
+        identifiers = to_query
+    batches = [
+        identifiers[idx : idx + batch_size]
+        for idx in range(0, len(identifiers), batch_size)
+    ]
+    found: dict = {}
+    with profiler.stage("INSPIRE-HEP lookup") as info:
+        info["records"] = len(identifiers)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for result in pool.map(
+                lambda batch: _lookup_batch(batch, 2 * batch_size), batches
+            ):
+                found.update(result)
+
+    if cache.SETTINGS["use_cache"]:
+        for kind, value in identifiers:
+            key = get_key(kind, value)
+            if key in found:
+                answer = {"status": "found", "collaboration": found[key]}
+            else:
+                answer = {"status": "not_found", "collaboration": None}
+            _CACHE.set(key, answer)
+        _CACHE.save()
+
+    for kind, value in identifiers:
+        key = get_key(kind, value)
+        if key in found:
+            collabs[key] = found[key]
+    return collabs
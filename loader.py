@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+"""
+Loads the static input files (yaml, json, csv).
+The parsed content is kept in a compiled (pickle) cache,
+which is invalidated when the file modification time and content change
+"""
+
+import os
+import csv
+import json
+import pickle
+import hashlib
+import cache
+import profiler
+
+# Version of the cache format: increase it to invalidate the existing caches
+CACHE_VERSION = 1
+
+_CACHE_DIR = os.path.join(cache.DEFAULT_DIR, "inputs")
+
+
+def _parse_yaml(filename):
+    # yaml is only needed when the cache is outdated
+    # pylint: disable-next=import-outside-toplevel
+    import yaml
+
+    # Use the libyaml C loader when available
+    yaml_loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(filename, encoding="utf-8") as in_file:
+        return yaml.load(in_file, Loader=yaml_loader)
+
+
+def _parse_json(filename):
+    with open(filename, encoding="utf-8") as in_file:
+        return json.load(in_file)
+
+
+def _parse_csv(filename):
+    with open(filename, encoding="utf-8") as in_file:
+        return list(csv.reader(in_file))
+
+
+def _get_digest(filename):
+    with open(filename, "rb") as in_file:
+        return hashlib.sha256(in_file.read()).hexdigest()
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, "rb") as in_file:
+            cached = pickle.load(in_file)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if cached.get("version") != CACHE_VERSION:
+        return None
+    return cached
+
+
+def _write_cache(cache_path, cached):
+    os.makedirs(_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as out_file:
+        pickle.dump(cached, out_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def _load(filename, parse):
+    """
+    Returns the parsed content of the file.
+    The cached content is used if the file modification time and size did not change,
+    or if the content hash did not change
+    """
+    if not cache.SETTINGS["use_cache"]:
+        return parse(filename)
+    filename = os.path.realpath(filename)
+    stat = os.stat(filename)
+    key = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+    cache_path = os.path.join(_CACHE_DIR, key + ".pickle")
+    cached = _read_cache(cache_path)
+    if cached and (cached["mtime_ns"], cached["size"]) == (
+        stat.st_mtime_ns,
+        stat.st_size,
+    ):
+        return cached["data"]
+    digest = _get_digest(filename)
+    if cached and cached["sha256"] == digest:
+        data = cached["data"]
+    else:
+        data = parse(filename)
+    _write_cache(
+        cache_path,
+        {
+            "version": CACHE_VERSION,
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": digest,
+            "data": data,
+        },
+    )
+    return data
+
+
+def _load_profiled(filename, parse):
+    with profiler.stage("Load " + os.path.basename(filename)):
+        return _load(filename, parse)
+
+
+def load_yaml(filename):
+    """Returns the parsed yaml file"""
+    return _load_profiled(filename, _parse_yaml)
+
+
+def load_json(filename):
+    """Returns the parsed json file"""
+    return _load_profiled(filename, _parse_json)
+
+
+def load_csv(filename):
+    """Returns the list of rows of the csv file"""
+    return _load_profiled(filename, _parse_csv)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+Manifest of the fingerprints of the inputs used to generate each output file.
+It allows to skip the rendering when none of the inputs changed
+"""
+
+import os
+import json
+import hashlib
+import collections.abc
+
+DEFAULT_FILENAME = ".biblio_manifest.json"
+
+
+def _to_json(value):
+    """Converts the mappings (e.g. hal.HalRecord) and other values for json"""
+    if isinstance(value, collections.abc.Mapping):
+        return dict(value)
+    return str(value)
+
+
+def fingerprint_data(data):
+    """Returns the fingerprint of json-serializable data (e.g. the HAL entries)"""
+    dumped = json.dumps(data, sort_keys=True, ensure_ascii=False, default=_to_json)
+    return hashlib.sha256(dumped.encode("utf-8")).hexdigest()
+
+
+def fingerprint_file(filename):
+    """Returns the fingerprint of the file content"""
+    if not os.path.exists(filename):
+        return "missing"
+    with open(filename, "rb") as in_file:
+        return hashlib.sha256(in_file.read()).hexdigest()
+
+
+def fingerprint(hal_entries, filenames, **extra):
+    """
+    Returns the combined fingerprint of the HAL entries,
+    of the content of the input files and of the extra values
+    """
+    parts = {
+        "hal": fingerprint_data(hal_entries),
+        "files": {
+            os.path.basename(filename): fingerprint_file(filename)
+            for filename in filenames
+        },
+        "extra": extra,
+    }
+    return fingerprint_data(parts)
+
+
+class Manifest:
+    """
+    Stores the input fingerprint of each output file.
+    If force is set, the outputs are never considered up to date
+    """
+
+    def __init__(self, filename=DEFAULT_FILENAME, force=False):
+        self.filename = filename
+        self.force = force
+        self.entries = {}
+        self.updated = {}
+        if os.path.exists(filename):
+            with open(filename, encoding="utf-8") as in_file:
+                self.entries = json.load(in_file)
+
+    def is_up_to_date(self, out_filenames, input_fingerprint):
+        """Checks if all the output files exist and were generated from the same inputs"""
+        if self.force:
+            return False
+        return all(
+            os.path.exists(out_filename)
+            and self.entries.get(out_filename) == input_fingerprint
+            for out_filename in out_filenames
+        )
+
+    def update(self, out_filenames, input_fingerprint):
+        """Stores the fingerprint of the inputs of the output files"""
+        for out_filename in out_filenames:
+            self.updated[out_filename] = input_fingerprint
+        self.entries.update(self.updated)
+
+    def merge(self, updated):
+        """Merges the entries updated by another manifest (e.g. in a worker process)"""
+        self.updated.update(updated)
+        self.entries.update(updated)
+
+    def save(self):
+        """Writes the manifest to file"""
+        tmp_filename = self.filename + ".tmp"
+        with open(tmp_filename, "w", encoding="utf-8") as out_file:
+            json.dump(self.entries, out_file, indent=2, sort_keys=True)
+        os.replace(tmp_filename, self.filename)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+
+"""
+Instrumentation of the scripts: wall time, peak memory and number of records
+of each stage, and duration and size of each web request.
+Nothing is recorded unless the profiling is enabled (--profile).
+The memory is traced only on request (--profile-memory),
+since tracing the allocations slows down the execution
+"""
+
+import json
+import time
+import threading
+import contextlib
+import tracemalloc
+import urllib.parse
+
+DEFAULT_TRACE = "profile.json"
+
+_STATE: dict = {"enabled": False, "memory": False, "trace_file": None, "start": None}
+_STAGES: list = []
+_OPEN: list = []
+_REQUESTS: list = []
+_LOCK = threading.Lock()
+_LOCAL = threading.local()
+
+
+def add_arguments(parser):
+    """Adds the profiling command line option"""
+    parser.add_argument(
+        "--profile",
+        help="Measure the stages and the web requests, print a summary "
+        f"and write the trace to the file ({DEFAULT_TRACE} by default)",
+        nargs="?",
+        const=DEFAULT_TRACE,
+    )
+    parser.add_argument(
+        "--profile-memory",
+        help="Profile and also trace the peak memory of each stage "
+        "(the times then include the tracing overhead)",
+        dest="profile_memory",
+        action="store_true",
+    )
+
+
+def configure(args):
+    """Enables the profiling if requested by the parsed command line options"""
+    if args.profile or args.profile_memory:
+        enable(args.profile or DEFAULT_TRACE, args.profile_memory)
+
+
+def enable(trace_file=DEFAULT_TRACE, memory=False):
+    """Starts recording. The allocations are traced if memory is set"""
+    _STATE["enabled"] = True
+    _STATE["memory"] = memory
+    _STATE["trace_file"] = trace_file
+    _STATE["start"] = time.perf_counter()
+    if memory:
+        tracemalloc.start()
+
+
+def is_enabled():
+    """Checks if the profiling is enabled"""
+    return _STATE["enabled"]
+
+
+def _checkpoint():
+    """
+    Assigns the memory peak since the last checkpoint to the open stages.
+    Must be called with the lock
+    """
+    if not _STATE["memory"]:
+        return
+    peak = tracemalloc.get_traced_memory()[1]
+    for info in _OPEN:
+        info["peak_memory"] = max(info["peak_memory"], peak)
+    tracemalloc.reset_peak()
+
+
+@contextlib.contextmanager
+def stage(name):
+    """
+    Measures the stage.
+    Yields the record of the stage, where the number of processed records
+    can be set in the "records" key
+    """
+    if not _STATE["enabled"]:
+        yield {}
+        return
+    depth = getattr(_LOCAL, "depth", 0)
+    info = {
+        "name": name,
+        "depth": depth,
+        "thread": threading.current_thread().name,
+        "start": round(time.perf_counter() - _STATE["start"], 4),
+        "seconds": None,
+        "peak_memory": 0 if _STATE["memory"] else None,
+        "records": None,
+    }
+    with _LOCK:
+        _checkpoint()
+        _STAGES.append(info)
+        _OPEN.append(info)
+    _LOCAL.depth = depth + 1
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        info["seconds"] = round(time.perf_counter() - start, 4)
+        _LOCAL.depth = depth
+        with _LOCK:
+            _checkpoint()
+            _OPEN.remove(info)
+
+
+def record_request(method, url, status, sent, received, seconds):
+    """Records one web request: sent and received are the sizes in bytes"""
+    if not _STATE["enabled"]:
+        return
+    with _LOCK:
+        _REQUESTS.append(
+            {
+                "method": method,
+                "url": url,
+                "status": status,
+                "sent": sent,
+                "received": received,
+                "seconds": round(seconds, 4),
+                "start": round(time.perf_counter() - _STATE["start"] - seconds, 4),
+            }
+        )
+
+
+def get_trace():
+    """Returns the recorded stages and requests"""
+    with _LOCK:
+        peak = None
+        if _STATE["memory"]:
+            peak = max(
+                [tracemalloc.get_traced_memory()[1]]
+                + [info["peak_memory"] for info in _STAGES]
+            )
+        return {
+            "total_seconds": round(time.perf_counter() - _STATE["start"], 4),
+            "peak_memory": peak,
+            "stages": list(_STAGES),
+            "requests": list(_REQUESTS),
+        }
+
+
+def print_summary(trace):
+    """Prints the summary tables of the stages and of the requests per host"""
+    memory = trace["peak_memory"] is not None
+    if memory:
+        print(
+            f"\nProfile (total: {trace['total_seconds']:.2f} s,"
+            f" peak memory: {trace['peak_memory'] / 1e6:.1f} MB)"
+        )
+        print("The times include the overhead of the memory tracing")
+    else:
+        print(f"\nProfile (total: {trace['total_seconds']:.2f} s)")
+    peak_header = f" {'Peak (MB)':>10}" if memory else ""
+    print(f"{'Stage':<60} {'Time (s)':>9}{peak_header} {'Records':>9}")
+    for info in trace["stages"]:
+        name = "  " * info["depth"] + info["name"]
+        if len(name) > 60:
+            name = name[:57] + "..."
+        records = "" if info["records"] is None else str(info["records"])
+        peak = f" {info['peak_memory'] / 1e6:>10.1f}" if memory else ""
+        print(f"{name:<60} {info['seconds'] or 0:>9.3f}{peak} {records:>9}")
+
+    hosts: dict = {}
+    for req in trace["requests"]:
+        host = urllib.parse.urlsplit(req["url"]).netloc
+        totals = hosts.setdefault(host, [0, 0.0, 0, 0])
+        totals[0] += 1
+        totals[1] += req["seconds"]
+        totals[2] += req["sent"]
+        totals[3] += req["received"]
+    if hosts:
+        print(
+            f"\n{'Host':<40} {'Requests':>9} {'Time (s)':>9}"
+            f" {'Sent (kB)':>10} {'Received (kB)':>14}"
+        )
+        for host, (n_req, seconds, sent, received) in sorted(hosts.items()):
+            print(
+                f"{host:<40} {n_req:>9} {seconds:>9.3f}"
+                f" {sent / 1e3:>10.1f} {received / 1e3:>14.1f}"
+            )
+
+
+def report():
+    """Writes the trace and prints the summary if the profiling is enabled"""
+    if not _STATE["enabled"]:
+        return
+    trace = get_trace()
+    with open(_STATE["trace_file"], "w", encoding="utf-8") as out_file:
+        json.dump(trace, out_file, indent=2, ensure_ascii=False)
+    print_summary(trace)
+    print("Profile trace written to " + _STATE["trace_file"])
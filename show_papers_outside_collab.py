@@ -6,32 +6,32 @@ Searches for papers for specified authors but outside any collaboration
 
 import sys
 import argparse
-import urllib.request
-import urllib.parse
-import json
 import hal
+import inspire
+import profiler
 
 
 def _update_metadata(entries):
-    print("Collecting additional metadata from INSPIRE-HEP. This may take a while")
-    for entry in entries:
-        if entry.get("collaboration_s"):
-            continue
-        url = "https://inspirehep.net/api/"
-        doi = entry.get("doiId_s")
-        if doi:
-            url += "doi/" + doi
-        else:
-            arxiv = entry.get("arxivId_s")
-            if arxiv:
-                url += "arxiv/" + arxiv
-        with urllib.request.urlopen(url) as req:
-            inspire = json.loads(req.read().decode("utf-8"))
-            insmeta = inspire.get("metadata")
-            if insmeta:
-                collabs = insmeta.get("collaborations")
-                if collabs:
-                    entry["collaboration_s"] = collabs[0]["value"]
+    """Adds the collaboration from INSPIRE-HEP to the entries missing it"""
+    print("Collecting additional metadata from INSPIRE-HEP")
+    entries = list(entries)
+    missing = [entry for entry in entries if not entry.get("collaboration_s")]
+    identifiers = []
+    for entry in missing:
+        if entry.get("doiId_s"):
+            identifiers.append(("doi", entry["doiId_s"]))
+        if entry.get("arxivId_s"):
+            identifiers.append(("arxiv", entry["arxivId_s"]))
+    collabs = inspire.get_collaborations(identifiers)
+    for entry in missing:
+        for kind, field in [("doi", "doiId_s"), ("arxiv", "arxivId_s")]:
+            if not entry.get(field):
+                continue
+            collab = collabs.get(inspire.get_key(kind, entry[field]))
+            if collab:
+                entry["collaboration_s"] = collab
+                break
+    return entries
 
 
 def show_papers_outside_collab(group, ymin):
@@ -41,9 +41,8 @@ def show_papers_outside_collab(group, ymin):
         "halId_s,authFullName_s,collaboration_s,title_s,arxivId_s,doiId_s,producedDateY_i",
         ymin,
     )
-    _update_metadata(entries)
     papers = []
-    for entry in entries:
+    for entry in _update_metadata(entries):
         if "collaboration_s" in entry:
             continue
         papers.append(entry)
@@ -61,12 +60,22 @@ def show_papers_outside_collab(group, ymin):
     return 0
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Utility for bibliography")
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    parser = argparse.ArgumentParser(prog=prog, description="Utility for bibliography")
     parser.add_argument("--group", help="Subatech group", default="SUBATECH-PLASMA")
     parser.add_argument("--ymin", help="Minimum year", type=int, default=2007)
+    hal.add_arguments(parser)
+    profiler.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    hal.configure(args)
+    profiler.configure(args)
+    ret_code = show_papers_outside_collab(args.group, args.ymin)
+    profiler.report()
 
-    args = parser.parse_args()
-    RET_CODE = show_papers_outside_collab(args.group, args.ymin)
+    return ret_code
 
-    sys.exit(RET_CODE)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,35 +5,30 @@
 import sys
 import argparse
 import hal
+import profiler
 
 
-def _get_data(group, doc_types, ymin):
-    entries = {}
-    for dt in doc_types:
-        entries[dt] = hal.get_parsed(
-            f"collCode_s:{group} docType_s:{dt}",
-            "halId_s,producedDateY_i",
+def _get_data(group, ymin, all_groups=False):
+    """
+    Returns the number of publications per doc type and year.
+    The counts are computed by HAL with a single facet query.
+    If all_groups is set, the counts are returned for all SUBATECH groups
+    """
+    if all_groups:
+        counts = hal.get_facets(
+            "collCode_s:SUBATECH",
+            ["collCode_s", "docType_s", "producedDateY_i"],
             ymin,
         )
-    return entries
-
-
-def _count(entries):
-    pubs = {}
-    for entry in entries:
-        year = entry.get("producedDateY_i")
-        if not year:
-            print("Caveat: no year found in")
-            print(entry)
-            year = "0"
-        if year not in pubs:
-            pubs[year] = 0
-        pubs[year] += 1
-    return pubs
+        return {key: val for key, val in counts.items() if key.startswith("SUBATECH-")}
+    return {
+        group: hal.get_facets(
+            f"collCode_s:{group}", ["docType_s", "producedDateY_i"], ymin
+        )
+    }
 
 
-def _show_stats(entries, ymin):
-    pubs = _count(entries)
+def _show_stats(pubs, ymin):
     for key in sorted(pubs.keys(), reverse=True):
         if int(key) < ymin:
             continue
@@ -41,22 +36,41 @@ def _show_stats(entries, ymin):
     return 0
 
 
-def show_stats(group, doc_types, ymin):
+def show_stats(group, doc_types, ymin, all_groups=False):
     """Show statistics per group"""
-    data = _get_data(group, doc_types, ymin)
-    for key, val in data.items():
-        print("Publication type: " + key)
-        _show_stats(val, ymin)
+    data = _get_data(group, ymin, all_groups)
+    for grp, counts in sorted(data.items()):
+        if all_groups:
+            print("\nGroup: " + grp)
+        for doc_type in doc_types:
+            print("Publication type: " + doc_type)
+            _show_stats(counts.get(doc_type, {}), ymin)
     return 0
 
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Utility for bibliography")
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    parser = argparse.ArgumentParser(prog=prog, description="Utility for bibliography")
     parser.add_argument("--group", help="Subatech group", default="SUBATECH-PLASMA")
     parser.add_argument("--ymin", help="Minimum year", type=int, default=2015)
+    parser.add_argument(
+        "--all-groups",
+        help="Show the statistics of all Subatech groups",
+        dest="all_groups",
+        action="store_true",
+    )
+    hal.add_arguments(parser)
+    profiler.add_arguments(parser)
 
-    args = parser.parse_args()
-    g_doc_types = ["ART", "COMM", "THESE", "POSTER"]
-    RET_CODE = show_stats(args.group, g_doc_types, args.ymin)
+    args = parser.parse_args(argv)
+    hal.configure(args)
+    profiler.configure(args)
+    doc_types = ["ART", "COMM", "THESE", "POSTER"]
+    ret_code = show_stats(args.group, doc_types, args.ymin, args.all_groups)
+    profiler.report()
 
-    sys.exit(RET_CODE)
+    return ret_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+
+"""
+Snapshot of the web responses (HAL, INSPIRE-HEP, ldap) needed by a run.
+A snapshot is recorded by running a script with the snapshot command,
+and replayed with the --snapshot option of the scripts, without network access
+"""
+
+import sys
+import json
+import gzip
+import base64
+import datetime
+import threading
+import urllib.error
+
+# Version of the snapshot format
+SNAPSHOT_VERSION = 1
+
+_STATE: dict = {"mode": None, "filename": None}
+_RESPONSES: dict = {}
+_LOCK = threading.Lock()
+
+
+def _get_key(method, url, body):
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    return (method, url, body or None)
+
+
+def is_enabled():
+    """Checks if the responses are being recorded or replayed"""
+    return _STATE["mode"] is not None
+
+
+def start_recording():
+    """Records the responses of all the following web requests"""
+    _RESPONSES.clear()
+    _STATE["mode"] = "record"
+
+
+def record(method, url, body, data):
+    """Stores the response (in bytes) of the request if recording"""
+    if _STATE["mode"] != "record":
+        return
+    with _LOCK:
+        _RESPONSES[_get_key(method, url, body)] = data
+
+
+def replay(method, url, body):
+    """
+    Returns the recorded response of the request if replaying, None otherwise.
+    Raises URLError if the request is not in the snapshot
+    """
+    if _STATE["mode"] != "replay":
+        return None
+    data = _RESPONSES.get(_get_key(method, url, body))
+    if data is None:
+        raise urllib.error.URLError(
+            f"Request not in snapshot {_STATE['filename']}: {method} {url}"
+        )
+    return data
+
+
+def save(filename, command=None):
+    """Writes the recorded responses to the compressed snapshot file"""
+    responses = []
+    with _LOCK:
+        for (method, url, body), data in sorted(
+            _RESPONSES.items(), key=lambda item: (item[0][1], item[0][2] or "")
+        ):
+            response = {"method": method, "url": url, "body": body}
+            try:
+                response["text"] = data.decode("utf-8")
+            except UnicodeDecodeError:
+                response["base64"] = base64.b64encode(data).decode("ascii")
+            responses.append(response)
+    with gzip.open(filename, "wt", encoding="utf-8") as out_file:
+        json.dump(
+            {
+                "version": SNAPSHOT_VERSION,
+                "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                "command": command,
+                "responses": responses,
+            },
+            out_file,
+            ensure_ascii=False,
+        )
+    print(f"Snapshot {filename}: {len(responses)} responses")
+
+
+def _read(filename):
+    with gzip.open(filename, "rt", encoding="utf-8") as in_file:
+        content = json.load(in_file)
+    if content.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"Snapshot {filename} has version {content.get('version')}, "
+            f"expected {SNAPSHOT_VERSION}"
+        )
+    return content
+
+
+def load(filename):
+    """Loads the snapshot: the following web requests are served from it"""
+    content = _read(filename)
+    _RESPONSES.clear()
+    for response in content["responses"]:
+        if "text" in response:
+            data = response["text"].encode("utf-8")
+        else:
+            data = base64.b64decode(response["base64"])
+        key = _get_key(response["method"], response["url"], response["body"])
+        _RESPONSES[key] = data
+    _STATE["mode"] = "replay"
+    _STATE["filename"] = filename
+
+
+def record_script(filename, script, script_args):
+    """Runs the script with the arguments and records the responses in the snapshot"""
+    # pylint: disable-next=import-outside-toplevel
+    import runpy
+
+    command = [script] + script_args
+    start_recording()
+    sys.argv = list(command)
+    ret_code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as err:
+        ret_code = err.code
+    save(filename, command)
+    return ret_code
+
+
+def show_info(filename):
+    """Prints the content of the snapshot"""
+    content = _read(filename)
+    print(f"Snapshot version {content['version']} created {content['created']}")
+    if content.get("command"):
+        print("Command: " + " ".join(content["command"]))
+    for response in content["responses"]:
+        size = len(response.get("text", response.get("base64")))
+        print(f"{response['method']} {response['url']} ({size} characters)")
+    return 0
+
+
+def main(argv=None, prog=None):
+    """Command line interface: returns the return code"""
+    # pylint: disable-next=import-outside-toplevel
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Snapshot of the web responses"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser(
+        "record", help="Run a script and record its web responses"
+    )
+    record_parser.add_argument("snapshot", help="Snapshot file")
+    record_parser.add_argument("script", help="Script to run")
+    record_parser.add_argument(
+        "script_args", help="Arguments of the script", nargs=argparse.REMAINDER
+    )
+    info_parser = subparsers.add_parser("info", help="Show the snapshot content")
+    info_parser.add_argument("snapshot", help="Snapshot file")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        return record_script(args.snapshot, args.script, args.script_args)
+    return show_info(args.snapshot)
+
+
+if __name__ == "__main__":
+    # Recording must set the state of the snapshot module used by the web client
+    # pylint: disable-next=import-self
+    import snapshot
+
+    sys.exit(snapshot.main())
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+
+"""Shared HTTP client keeping the connections alive between requests"""
+
+import gzip
+import zlib
+import time
+import threading
+import urllib.error
+import urllib.parse
+import profiler
+import snapshot
+
+DEFAULT_TIMEOUT = 100
+
+# Maximum number of persistent connections per host
+DEFAULT_MAX_CONNECTIONS = 4
+
+
+def _get_stale_errors():
+    """Returns the errors signaling that a kept-alive connection was closed by the server"""
+    # pylint: disable-next=import-outside-toplevel
+    import http.client
+
+    return (
+        http.client.RemoteDisconnected,
+        http.client.CannotSendRequest,
+        BrokenPipeError,
+        ConnectionResetError,
+    )
+
+
+class WebClient:
+    """
+    HTTP client with a bounded pool of persistent connections per host.
+    The same client can be safely shared between threads
+    """
+
+    def __init__(
+        self, timeout=DEFAULT_TIMEOUT, max_connections=DEFAULT_MAX_CONNECTIONS
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._idle: dict = {}
+        self._slots: dict = {}
+
+    def _get_slots(self, origin):
+        with self._lock:
+            if origin not in self._slots:
+                self._slots[origin] = threading.BoundedSemaphore(self.max_connections)
+            return self._slots[origin]
+
+    def _acquire(self, origin, fresh=False):
+        """Returns an idle connection to the host, or a new one"""
+        if not fresh:
+            with self._lock:
+                idle = self._idle.get(origin)
+                if idle:
+                    return idle.pop()
+        # pylint: disable-next=import-outside-toplevel
+        import http.client
+
+        scheme, host = origin
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, timeout=self.timeout)
+        return http.client.HTTPConnection(host, timeout=self.timeout)
+
+    def _release(self, origin, conn):
+        """Puts the connection back in the pool"""
+        with self._lock:
+            idle = self._idle.setdefault(origin, [])
+            if len(idle) < self.max_connections:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(self, origin, method, path, body, headers):
+        """Sends the request and returns the response and its content"""
+        conn = self._acquire(origin)
+        try:
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+            except _get_stale_errors():
+                # The idle connection was closed by the server: retry once
+                conn.close()
+                conn = self._acquire(origin, fresh=True)
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+            data = response.read()
+        except Exception:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release(origin, conn)
+        return response, data
+
+    def request(self, method, url, body=None, headers=None, max_redirects=5):
+        """Performs the request and returns the decoded content in bytes"""
+        replayed = snapshot.replay(method, url, body)
+        if replayed is not None:
+            return replayed
+        request_key = (method, url, body)
+        all_headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        if headers:
+            all_headers.update(headers)
+        for _ in range(max_redirects + 1):
+            split = urllib.parse.urlsplit(url)
+            origin = (split.scheme, split.netloc)
+            path = split.path or "/"
+            if split.query:
+                path += "?" + split.query
+            with self._get_slots(origin):
+                start = time.perf_counter()
+                response, data = self._send(origin, method, path, body, all_headers)
+            profiler.record_request(
+                method,
+                url,
+                response.status,
+                len(body or b""),
+                len(data),
+                time.perf_counter() - start,
+            )
+            if response.status in (301, 302, 303, 307, 308):
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                if response.status == 303:
+                    method, body = "GET", None
+                continue
+            if response.status >= 400:
+                raise urllib.error.HTTPError(
+                    url, response.status, response.reason, response.headers, None
+                )
+            encoding = response.getheader("Content-Encoding", "")
+            if encoding == "gzip":
+                data = gzip.decompress(data)
+            elif encoding == "deflate":
+                data = zlib.decompress(data)
+            snapshot.record(*request_key, data)
+            return data
+        raise urllib.error.URLError(f"Too many redirections for {url}")
+
+    def get(self, url, params=None):
+        """GET request. The optional parameters are url-encoded in the query"""
+        if params:
+            url += "?" + urllib.parse.urlencode(params)
+        return self.request("GET", url)
+
+    def post(self, url, params):
+        """POST request with url-encoded parameters"""
+        return self.request(
+            "POST",
+            url,
+            urllib.parse.urlencode(params).encode(),
+            {"Content-Type": "application/x-www-form-urlencoded"},
+        )
+
+    def close(self):
+        """Closes all the idle connections"""
+        with self._lock:
+            for idle in self._idle.values():
+                for conn in idle:
+                    conn.close()
+            self._idle.clear()
+
+
+_CLIENT = WebClient()
+
+
+def get_client():
+    """Returns the client shared by all modules"""
+    return _CLIENT